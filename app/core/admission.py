@@ -0,0 +1,196 @@
+"""Admission control module"""
+import asyncio
+import json
+import math
+import re
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Callable, Dict, List
+
+from app.core.config import settings
+
+
+class Priority(IntEnum):
+    """Request priorities, lower is more important"""
+
+    CRITICAL = 0
+    NORMAL = 1
+    LEADERBOARD = 2
+    ANALYTICS = 3
+
+
+ROUTE_PRIORITIES = [
+    (re.compile(r"^/games/[^/]+/stop$"), Priority.CRITICAL),
+    (re.compile(r"^/games/stop:batch$"), Priority.CRITICAL),
+    (re.compile(r"^/leaderboard"), Priority.LEADERBOARD),
+    (re.compile(r"^/analytics"), Priority.ANALYTICS),
+]
+
+# Share of the concurrency limit each priority may use, so there is always
+# room left for more important requests
+CONCURRENCY_SHARES = {
+    Priority.CRITICAL: 1.0,
+    Priority.NORMAL: 0.8,
+    Priority.LEADERBOARD: 0.5,
+    Priority.ANALYTICS: 0.3,
+}
+
+
+def route_priority(path: str) -> Priority:
+    """Priority of a request path"""
+    for pattern, priority in ROUTE_PRIORITIES:
+        if pattern.match(path):
+            return priority
+    return Priority.NORMAL
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a sleeping task.
+
+    Blocking work on the loop (sync database calls, hashing) delays every
+    coroutine, so the lag is a direct measure of queueing inside the worker.
+    The reported lag is the smallest sample of a sliding window: a single
+    slow call, like one bcrypt login, shows up in one sample only, while an
+    overloaded worker is late on every wake-up.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        window_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval = interval_seconds
+        self.clock = clock
+        self.max_lag_ms = 0.0
+        self._samples: deque[float] = deque(maxlen=max(1, round(window_seconds / interval_seconds)))
+        self._task: asyncio.Task | None = None
+
+    @property
+    def lag_ms(self) -> float:
+        """Lag sustained over the whole window, 0 until the window is full"""
+        if len(self._samples) < self._samples.maxlen:
+            return 0.0
+        return min(self._samples)
+
+    def sample(self, lag_ms: float) -> None:
+        """Add a lag measurement to the window"""
+        self._samples.append(lag_ms)
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    async def run(self) -> None:
+        """Sample the lag until cancelled"""
+        while True:
+            expected = self.clock() + self.interval
+            await asyncio.sleep(self.interval)
+            self.sample(max(0.0, self.clock() - expected) * 1000)
+
+    def start(self) -> None:
+        """Start sampling in the background"""
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class AdmissionController:
+    """Sheds low priority requests when the worker is overloaded.
+
+    A priority is shed when the sustained loop lag reaches its threshold (analytics
+    first, then the leaderboard, then everything but critical routes) or when
+    its share of the concurrency limit is in use. Critical requests are never
+    shed.
+    """
+
+    def __init__(self, monitor: LoopLagMonitor, lag_threshold_ms: float, max_concurrency: int):
+        self.monitor = monitor
+        self.lag_threshold_ms = lag_threshold_ms
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.admitted: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self.shed: Dict[Priority, int] = {priority: 0 for priority in Priority}
+
+    def shed_priority(self) -> Priority:
+        """Lowest priority still admitted at the current loop lag"""
+        lag_ratio = self.monitor.lag_ms / self.lag_threshold_ms
+        if lag_ratio >= 4:
+            return Priority.CRITICAL
+        if lag_ratio >= 2:
+            return Priority.NORMAL
+        if lag_ratio >= 1:
+            return Priority.LEADERBOARD
+        return Priority.ANALYTICS
+
+    def try_acquire(self, priority: Priority) -> bool:
+        """Admit a request, or count it as shed"""
+        if priority != Priority.CRITICAL and (
+            priority > self.shed_priority()
+            or self.in_flight >= self.max_concurrency * CONCURRENCY_SHARES[priority]
+        ):
+            self.shed[priority] += 1
+            return False
+        self.in_flight += 1
+        self.admitted[priority] += 1
+        return True
+
+    def release(self) -> None:
+        """Mark an admitted request as finished"""
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {
+            "loop_lag_ms": round(self.monitor.lag_ms, 3),
+            "max_loop_lag_ms": round(self.monitor.max_lag_ms, 3),
+            "in_flight": self.in_flight,
+            "admitted": {priority.name.lower(): count for priority, count in self.admitted.items()},
+            "shed": {priority.name.lower(): count for priority, count in self.shed.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware answering 503 with Retry-After to shed requests"""
+
+    def __init__(self, app, controller: AdmissionController, retry_after_seconds: float):
+        self.app = app
+        self.controller = controller
+        self.retry_after = str(math.ceil(retry_after_seconds))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_CONTROL_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        if not self.controller.try_acquire(route_priority(scope["path"])):
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": "Server is overloaded, retry later"}).encode()
+        headers: List[tuple] = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", self.retry_after.encode()),
+        ]
+        await send({"type": "http.response.start", "status": 503, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+loop_lag_monitor = LoopLagMonitor(
+    interval_seconds=settings.LOOP_LAG_INTERVAL_MS / 1000,
+    window_seconds=settings.ADMISSION_LAG_WINDOW_SECONDS,
+)
+admission_controller = AdmissionController(
+    monitor=loop_lag_monitor,
+    lag_threshold_ms=settings.ADMISSION_LAG_THRESHOLD_MS,
+    max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+)
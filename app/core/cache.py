@@ -0,0 +1,191 @@
+"""Cache module"""
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+
+PURGE_EVERY_WRITES = 1_000
+
+
+class CacheBackend(ABC):
+    """Abstract cache backend.
+
+    Values must be JSON serializable so that every backend can store them.
+    """
+
+    shared = False  # Whether every worker process sees the same entries
+
+    @abstractmethod
+    def get(self, key: str) -> Any | None:
+        """Get a value, or None when missing or expired"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Store a value for a while"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        """Atomically store a value unless the key is present, returning whether it was stored"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a value if present"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Atomically increment a persistent counter and return its new value"""
+        raise NotImplementedError
+
+    def get_generation(self, namespace: str) -> int:
+        """Current generation of a namespace, to be embedded in its keys"""
+        return self.get(f"{namespace}:generation") or 0
+
+    def bump_generation(self, namespace: str) -> int:
+        """Invalidate every key built with the current generation of a namespace"""
+        return self.incr(f"{namespace}:generation")
+
+
+class MemoryCache(CacheBackend):
+    """In-process cache, only coherent within a single worker.
+
+    Counters are kept apart from the size-bounded items, so they are never
+    evicted and never push items out.
+    """
+
+    def __init__(self, max_size: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self._clock = clock
+        self._items: OrderedDict[str, tuple[float | None, Any]] = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        if key in self._counters:
+            return self._counters[key]
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= self._clock():
+            self._items.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        with self._lock:
+            self._items[key] = (self._clock() + ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        with self._lock:
+            if self.get(key) is not None:
+                return False
+            self._items[key] = (self._clock() + ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+            return True
+
+    def delete(self, key: str) -> None:
+        self._items.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+
+class SQLiteCache(CacheBackend):
+    """Cache stored in a SQLite file, shared by all worker processes on one host"""
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def get(self, key: str) -> Any | None:
+        row = (
+            self._connection()
+            .execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,))
+            .fetchone()
+        )
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl_seconds),
+        )
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def add(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at WHERE cache.expires_at <= ?",
+            (key, json.dumps(value), now + ttl_seconds, now),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def incr(self, key: str) -> int:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO cache (key, value, expires_at) VALUES (?, '1', NULL) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                (key,),
+            )
+            (value,) = connection.execute(
+                "SELECT value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        return int(value)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+
+@lru_cache
+def get_cache() -> CacheBackend:
+    """Return the configured cache backend"""
+    if settings.CACHE_BACKEND == "sqlite":
+        return SQLiteCache(settings.CACHE_SQLITE_PATH)
+    return MemoryCache()
@@ -11,9 +11,54 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./timer_game.db"
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    BCRYPT_ROUNDS: int = 12  # Pick with `python -m app.scripts.calibrate_bcrypt`
+    TOKEN_REVOCATION_MODE: str = "blacklist"  # or "generation" (per-user counter)
+    TOKEN_GENERATION_CACHE_TTL_SECONDS: int = 3600
+    TOKEN_GENERATION_LOCAL_CACHE_TTL_SECONDS: int = 5  # With a per-process cache
     ALGORITHM: str = "HS256"
+    ADMIN_EMAILS: str = ""  # Comma-separated emails of the users allowed on /admin
     GAME_SESSION_EXPIRE_MINUTES: int = 30
     TARGET_TIME_MS: int = 10_000
+    IDEMPOTENCY_TTL_SECONDS: int = 300
+    STOP_BATCH_MAX_SIZE: int = 100
+    GAME_SHARDS: int = 0  # Spread game sessions over this many SQLite files, 0 disables
+    GAME_SHARD_DIR: str = "./shards"
+    JOURNAL_ENABLED: bool = False  # Acknowledge game results once journaled
+    JOURNAL_DIR: str = "./journal"
+    JOURNAL_FLUSH_INTERVAL_MS: int = 2
+    JOURNAL_APPLY_INTERVAL_MS: int = 200
+    JOURNAL_APPLY_BATCH: int = 1_000
+    JOURNAL_COMPACT_BYTES: int = 1_048_576
+    LEADERBOARD_SNAPSHOT_ENABLED: bool = False  # Serve the leaderboard from a shared file
+    LEADERBOARD_SNAPSHOT_PATH: str = "./leaderboard.snapshot"
+    LEADERBOARD_SNAPSHOT_INTERVAL_SECONDS: float = 5
+    RECENT_RESULTS_MAX_USERS: int = 100_000  # Kept in memory with a shared cache, 0 disables
+    ADMISSION_CONTROL_ENABLED: bool = False  # Shed low priority requests under load
+    ADMISSION_LAG_THRESHOLD_MS: float = 100
+    ADMISSION_LAG_WINDOW_SECONDS: float = 3  # The lag must last this long to shed
+    ADMISSION_MAX_CONCURRENCY: int = 100
+    ADMISSION_RETRY_AFTER_SECONDS: float = 1
+    LOOP_LAG_INTERVAL_MS: int = 100
+    PROFILER_ENABLED: bool = False  # Allow admins to record sampling profiles
+    PROFILER_INTERVAL_MS: float = 5
+    WARMUP_ENABLED: bool = True  # Load the hottest caches before serving
+    LEADERBOARD_WARMUP_PAGES: int = 3
+    STARTUP_MODE: str = "full"  # "fast" skips schema creation when it is up to date
+    CACHE_BACKEND: str = "memory"  # "memory" or "sqlite" (shared by workers)
+    CACHE_SQLITE_PATH: str = "./timer_game_cache.db"
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    LEADERBOARD_CACHE_TTL_SECONDS: int = 30
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_MAX_KEYS: int = 100_000  # Buckets tracked per limiter
+    RATE_LIMIT_AUTH_PER_MINUTE: int = 20
+    RATE_LIMIT_AUTH_BURST: int = 10
+    RATE_LIMIT_GAMES_PER_MINUTE: int = 120
+    RATE_LIMIT_GAMES_BURST: int = 30
+    RATE_LIMIT_LEADERBOARD_PER_MINUTE: int = 60
+    RATE_LIMIT_LEADERBOARD_BURST: int = 20
+    RATE_LIMIT_ANALYTICS_PER_MINUTE: int = 60
+    RATE_LIMIT_ANALYTICS_BURST: int = 20
     # Below is internal config
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -0,0 +1,111 @@
+"""Global counters module.
+
+Totals shown to everyone (players, games played, sum of deviations) are kept
+in the global_counters table and incremented by the requests that change
+them, so reading them never aggregates the users or game_sessions tables.
+Increments are staged in the transaction writing the counted rows, so they
+are committed, or lost, together with them. The game counters live next to
+the game sessions, in every shard when sharded. The rows are seeded once
+from full aggregates, at startup.
+"""
+from typing import Dict, Iterable, List
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.repository import AbstractRepository
+from app.models import GlobalCounter
+
+PLAYERS = "players"
+GAMES_PLAYED = "games_played"
+DEVIATION_SUM = "deviation_sum"
+COUNTERS = (PLAYERS, GAMES_PLAYED, DEVIATION_SUM)
+GAME_COUNTERS = (GAMES_PLAYED, DEVIATION_SUM)
+
+
+class GlobalCounterRepository(AbstractRepository[GlobalCounter]):
+    """Global counter repository"""
+
+    def create(self, item: GlobalCounter, db_session: Session) -> GlobalCounter:
+        """Create a counter"""
+        db_session.add(item)
+        db_session.commit()
+        db_session.refresh(item)
+        return item
+
+    def get(self, item_id, db_session: Session) -> GlobalCounter | None:
+        """Get a counter by name"""
+        statement = select(GlobalCounter).where(GlobalCounter.name == item_id)
+        return db_session.exec(statement).first()
+
+    def get_all(self, db_session: Session) -> List[GlobalCounter]:
+        """List counters"""
+        return list(db_session.exec(select(GlobalCounter)).all())
+
+    def get_values(self, db_session: Session) -> Dict[str, int]:
+        """Map counter names to values"""
+        statement = select(GlobalCounter.name, GlobalCounter.value)
+        return dict(db_session.exec(statement).all())
+
+    def stage(self, deltas: Dict[str, int], db_session: Session) -> None:
+        """Add to counters in the current transaction, relative to their current values"""
+        for name, delta in deltas.items():
+            if delta:
+                db_session.exec(
+                    update(GlobalCounter)
+                    .where(GlobalCounter.name == name)
+                    .values(value=GlobalCounter.value + delta)
+                )
+
+    def increment(self, deltas: Dict[str, int], db_session: Session) -> None:
+        """Add to counters in one transaction, relative to their current values"""
+        self.stage(deltas, db_session=db_session)
+        db_session.commit()
+
+    def set_values(self, values: Dict[str, int], db_session: Session) -> None:
+        """Overwrite counters, creating missing ones"""
+        existing = self.get_values(db_session)
+        for name, value in values.items():
+            if name in existing:
+                db_session.exec(
+                    update(GlobalCounter).where(GlobalCounter.name == name).values(value=value)
+                )
+            else:
+                db_session.add(GlobalCounter(name=name, value=value))
+        db_session.commit()
+
+    def update(self, updated_item: GlobalCounter, db_session: Session) -> GlobalCounter:
+        """Update a counter"""
+
+    def delete(self, item: GlobalCounter, db_session: Session) -> GlobalCounter:
+        """Delete a counter"""
+
+
+counter_db = GlobalCounterRepository()
+
+
+def stage_counters(db_session: Session, deltas: Dict[str, int]) -> None:
+    """Add to global counters when the caller's transaction commits."""
+    counter_db.stage(deltas, db_session=db_session)
+
+
+def get_counters(db_session: Session) -> Dict[str, int]:
+    """Get every global counter, missing ones as 0."""
+    values = counter_db.get_values(db_session=db_session)
+    return {name: values.get(name, 0) for name in COUNTERS}
+
+
+def is_seeded(db_session: Session, names: Iterable[str] = COUNTERS) -> bool:
+    """Check if every global counter, or some of them, exists."""
+    return set(names) <= counter_db.get_values(db_session=db_session).keys()
+
+
+def seed_counters(db_session: Session, values: Dict[str, int]) -> bool:
+    """Create the global counters from full aggregates, unless another worker did."""
+    try:
+        counter_db.set_values(values, db_session=db_session)
+    except IntegrityError:
+        db_session.rollback()
+        return False
+    return True
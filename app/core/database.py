@@ -1,19 +1,84 @@
 """Database module"""
+import hashlib
+import logging
 
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import Session, SQLModel, create_engine
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
     echo=False,
 )
 
+# Columns added to existing tables, created by init_db on databases that lack them
+ADDED_COLUMNS = [
+    ("users", "token_generation", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+def schema_fingerprint() -> str:
+    """Hash of the tables and columns declared by the models"""
+    tables = []
+    for table in sorted(SQLModel.metadata.sorted_tables, key=lambda item: item.name):
+        columns = ",".join(f"{column.name}:{column.type!r}" for column in table.columns)
+        tables.append(f"{table.name}({columns})")
+    return hashlib.sha256(";".join(tables).encode()).hexdigest()
+
+
+def get_schema_marker() -> str | None:
+    """Return the schema fingerprint recorded by the last schema creation"""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT fingerprint FROM schema_version")).scalar()
+    except SQLAlchemyError:
+        return None
+
+
+def set_schema_marker(fingerprint: str) -> None:
+    """Record the schema fingerprint"""
+    with engine.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE IF NOT EXISTS schema_version (fingerprint VARCHAR(64) NOT NULL)")
+        )
+        connection.execute(text("DELETE FROM schema_version"))
+        connection.execute(
+            text("INSERT INTO schema_version (fingerprint) VALUES (:fingerprint)"),
+            {"fingerprint": fingerprint},
+        )
+
+
+def add_missing_columns(bind: Engine = engine) -> None:
+    """Add the columns that create_all does not add to existing tables"""
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table, column, definition in ADDED_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+                logger.info("Adding column %s.%s", table, column)
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+
 
 def init_db():
-    """Initialize the database"""
+    """Initialize the database.
+
+    In "fast" startup mode the schema is only created when the recorded
+    fingerprint does not match the models.
+    """
+    fingerprint = schema_fingerprint()
+    if settings.STARTUP_MODE == "fast" and get_schema_marker() == fingerprint:
+        logger.info("Database schema is up to date, skipping creation")
+        return
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+    set_schema_marker(fingerprint)
 
 
 def get_session():
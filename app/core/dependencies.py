@@ -1,14 +1,22 @@
 """Dependencies module"""
 import logging
+from datetime import datetime
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session
 
+from app.core.config import settings
 from app.core.database import get_session
 from app.models import User
-from app.routers.auth import verify_token
-from app.routers.auth.service import get_user_by_email
+from app.routers.auth.service import (
+    cache_user,
+    decode_token,
+    get_cached_user,
+    get_user_by_email,
+    verify_token_generation,
+    verify_token_payload,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,14 +26,28 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 async def get_current_user(
     token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)
 ) -> User:
-    """Get user by token"""
+    """Get user by token.
+
+    With a cache shared by every worker, verified tokens are cached by JWT
+    ID, so repeated requests skip the blacklist and user lookups until the
+    token is revoked.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token_data = await verify_token(token, credentials_exception, session)
+    payload = decode_token(token, credentials_exception)
+    jti = payload.get("jti")
+    if jti:
+        user = get_cached_user(jti)
+        if user is not None:
+            if "gen" in payload:
+                await verify_token_generation(payload, credentials_exception, session)
+            return user
+
+    token_data = await verify_token_payload(payload, credentials_exception, session)
     if token_data is None:
         raise credentials_exception
 
@@ -33,4 +55,14 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
 
+    if jti and payload.get("exp"):
+        cache_user(jti, user, expires_at=datetime.utcfromtimestamp(payload["exp"]))
     return user
+
+
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """Get the current user, who must be listed in ADMIN_EMAILS."""
+    admin_emails = {email.strip() for email in settings.ADMIN_EMAILS.split(",") if email.strip()}
+    if current_user.email not in admin_emails:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return current_user
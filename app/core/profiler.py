@@ -0,0 +1,193 @@
+"""Sampling profiler module.
+
+A background thread periodically reads the stack of every other thread
+(sys._current_frames) and counts identical stacks, producing collapsed
+stacks ("frame;frame;frame count" lines) that flamegraph.pl and speedscope
+read. Code can label its own frame with span(), which shows up as a
+"[name]" frame, so samples map to the steps of a route.
+
+Nothing runs unless PROFILER_ENABLED is set and a profile is requested;
+span() then only costs a global check.
+"""
+import asyncio
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List
+
+from starlette.routing import BaseRoute, Match
+
+from app.core.config import settings
+
+
+class Profile:
+    """Collapsed stacks sampled from the running threads"""
+
+    def __init__(self, interval_seconds: float, route_label: str | None = None):
+        self.interval = interval_seconds
+        self.route_label = route_label
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    def sample(self, labels: Dict[int, List[str]]) -> None:
+        """Record the stacks of every thread except the sampling one"""
+        current = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if thread_id == current:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                for label in reversed(labels.get(id(frame), ())):
+                    stack.append(f"[{label}]")
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}")
+                frame = frame.f_back
+            if self.route_label is not None and f"[{self.route_label}]" not in stack:
+                continue
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def run(self, labels: Dict[int, List[str]]) -> None:
+        """Sample until stopped"""
+        while not self._done.wait(self.interval):
+            self.sample(labels)
+
+    def stop(self) -> None:
+        """Stop sampling"""
+        self._done.set()
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, most sampled first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    """Runs one profile at a time and holds the span labels"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval = interval_seconds
+        self.active = False
+        self.labels: Dict[int, List[str]] = {}
+        self.route: BaseRoute | None = None
+        self.route_label: str | None = None
+        self._route_requests_left = 0
+        self._route_done: asyncio.Event | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        """Whether a profile is being recorded"""
+        return self._lock.locked()
+
+    async def profile(self, seconds: float) -> Profile:
+        """Sample every thread for a while"""
+        async with self._lock:
+            return await self._record(Profile(self.interval), asyncio.sleep(seconds))
+
+    async def profile_route(self, route: BaseRoute, requests: int, timeout: float) -> Profile:
+        """Sample the next requests handled by a route, until a timeout"""
+        async with self._lock:
+            self.route, self.route_label = route, f"route {route.path}"
+            self._route_requests_left = requests
+            self._route_done = asyncio.Event()
+            try:
+                profile = Profile(self.interval, self.route_label)
+                return await self._record(profile, self._wait_route(timeout))
+            finally:
+                self.route = self.route_label = self._route_done = None
+
+    def matches(self, scope) -> bool:
+        """Whether a request is handled by the route being profiled"""
+        return self.route is not None and self.route.matches(scope)[0] == Match.FULL
+
+    def route_request_done(self) -> None:
+        """Count a profiled request of the route"""
+        self._route_requests_left -= 1
+        if self._route_requests_left <= 0 and self._route_done is not None:
+            self._route_done.set()
+
+    async def _wait_route(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._route_done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass  # Return what was sampled from fewer requests
+
+    async def _record(self, profile: Profile, until) -> Profile:
+        thread = threading.Thread(
+            target=profile.run, args=(self.labels,), name="profiler", daemon=True
+        )
+        self.active = True
+        thread.start()
+        try:
+            await until
+        finally:
+            self.active = False
+            profile.stop()
+            await asyncio.to_thread(thread.join)
+            self.labels.clear()
+        return profile
+
+
+class Span:
+    """Labels the frame that enters it while a profile is recorded"""
+
+    __slots__ = ("name", "key")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.key = 0
+
+    def __enter__(self):
+        self.key = id(sys._getframe(1))  # pylint: disable=protected-access
+        profiler.labels.setdefault(self.key, []).append(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        names = profiler.labels.get(self.key)
+        if names:
+            names.pop()
+            if not names:
+                profiler.labels.pop(self.key, None)
+
+
+class _NoSpan:
+    """Span used while no profile is recorded"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+NO_SPAN = _NoSpan()
+
+
+def span(name: str):
+    """Label the calling frame with a name in profiles"""
+    return Span(name) if profiler.active else NO_SPAN
+
+
+class ProfilerMiddleware:
+    """ASGI middleware labelling the requests of the route being profiled"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.matches(scope):
+            await self.app(scope, receive, send)
+            return
+        try:
+            with Span(profiler.route_label):
+                await self.app(scope, receive, send)
+        finally:
+            profiler.route_request_done()  # Failed requests count too
+
+
+profiler = Profiler(interval_seconds=settings.PROFILER_INTERVAL_MS / 1000)
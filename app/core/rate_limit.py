@@ -0,0 +1,165 @@
+"""Rate limiting module"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import math
+import time
+from array import array
+from typing import Callable, Dict, Hashable, List
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+
+EVICT_INTERVAL_SECONDS = 60.0
+HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+limiters: List["TokenBucketLimiter"] = []
+
+
+class TokenBucketLimiter:
+    """In-memory token bucket rate limiter.
+
+    Each key maps to a slot in two flat arrays (tokens left and last refill
+    time). Buckets are refilled lazily when a key is seen, and keys idle for
+    longer than a full refill are evicted periodically, their slots reused.
+    At most max_keys keys are tracked; past that the oldest key is dropped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        per_minute: int,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int | None = None,
+    ):
+        self.name = name
+        self.max_keys = settings.RATE_LIMIT_MAX_KEYS if max_keys is None else max_keys
+        self.rate = per_minute / 60
+        self.burst = float(burst)
+        self.idle_seconds = max(self.burst / self.rate, EVICT_INTERVAL_SECONDS)
+        self.clock = clock
+        self.allowed = 0
+        self.rejected = 0
+        self._slots: Dict[Hashable, int] = {}
+        self._tokens = array("d")
+        self._stamps = array("d")
+        self._free: List[int] = []
+        self._next_evict = clock() + EVICT_INTERVAL_SECONDS
+        limiters.append(self)
+
+    def acquire(self, key: Hashable) -> float:
+        """Take a token for a key, returning 0 or the seconds to wait before retrying"""
+        now = self.clock()
+        if now >= self._next_evict:
+            self.evict(now)
+
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate(key, now)
+        tokens = min(self.burst, self._tokens[slot] + (now - self._stamps[slot]) * self.rate)
+        self._stamps[slot] = now
+
+        if tokens >= 1:
+            self._tokens[slot] = tokens - 1
+            self.allowed += 1
+            return 0.0
+        self._tokens[slot] = tokens
+        self.rejected += 1
+        return (1 - tokens) / self.rate
+
+    def evict(self, now: float | None = None) -> None:
+        """Drop keys whose buckets have been idle long enough to be full again"""
+        now = self.clock() if now is None else now
+        oldest = now - self.idle_seconds
+        stale = [key for key, slot in self._slots.items() if self._stamps[slot] < oldest]
+        for key in stale:
+            self._free.append(self._slots.pop(key))
+        self._next_evict = now + EVICT_INTERVAL_SECONDS
+
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {"allowed": self.allowed, "rejected": self.rejected, "keys": len(self._slots)}
+
+    def _allocate(self, key: Hashable, now: float) -> int:
+        if len(self._slots) >= self.max_keys:
+            self.evict(now)
+            if len(self._slots) >= self.max_keys:
+                self._free.append(self._slots.pop(next(iter(self._slots))))
+        if self._free:
+            slot = self._free.pop()
+            self._tokens[slot] = self.burst
+            self._stamps[slot] = now
+        else:
+            slot = len(self._tokens)
+            self._tokens.append(self.burst)
+            self._stamps.append(now)
+        self._slots[key] = slot
+        return slot
+
+
+def client_ip(request: Request) -> str:
+    """Rate limit key for anonymous routes"""
+    return request.client.host if request.client else "unknown"
+
+
+def b64decode(segment: str) -> bytes:
+    """Decode an unpadded base64url JWT segment"""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def signed_claims(token: str) -> dict | None:
+    """Claims of a JWT whose HMAC signature is valid, or None.
+
+    Only the signature is checked, not the expiry: this is a few microseconds
+    of hashing, far cheaper than the full verification done later.
+    """
+    digest = HMAC_DIGESTS.get(settings.ALGORITHM)
+    if digest is None:
+        return None
+    try:
+        header, payload, signature = token.split(".")
+        expected = hmac.new(
+            settings.SECRET_KEY.encode(), f"{header}.{payload}".encode(), digest
+        ).digest()
+        if not hmac.compare_digest(expected, b64decode(signature)):
+            return None
+        claims = json.loads(b64decode(payload))
+    except (ValueError, binascii.Error):
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+def token_user_id(request: Request) -> Hashable:
+    """Rate limit key for authenticated routes.
+
+    Requests carrying a validly signed token are keyed by its user id, so a
+    user has one bucket whatever their IP. Anything else, including forged
+    tokens, shares the bucket of the client IP.
+    """
+    authorization = request.headers.get("Authorization", "")
+    _, _, token = authorization.partition(" ")
+    claims = signed_claims(token)
+    if claims and claims.get("uid"):
+        return claims["uid"]
+    return client_ip(request)
+
+
+def rate_limit(limiter: TokenBucketLimiter, key_func: Callable[[Request], Hashable]):
+    """Build a dependency that rejects requests over the limiter's rate"""
+
+    async def dependency(request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        retry_after = limiter.acquire(key_func(request))
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return dependency
@@ -0,0 +1,58 @@
+"""Game session shards module"""
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel, create_engine
+
+from app.core.config import settings
+from app.models import GameSession, GlobalCounter
+
+
+def shard_index(user_id: uuid.UUID, shard_count: int) -> int:
+    """Shard holding the game sessions of a user"""
+    return user_id.int % shard_count
+
+
+def shard_path(index: int, shard_dir: str | None = None) -> Path:
+    """Path of a shard's SQLite file"""
+    return Path(shard_dir or settings.GAME_SHARD_DIR) / f"game_sessions_{index}.db"
+
+
+def create_shard_engine(index: int, shard_dir: str | None = None) -> Engine:
+    """Create the engine of a shard, creating its file and tables if needed"""
+    path = shard_path(index, shard_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False}, echo=False
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        dbapi_connection.execute("PRAGMA synchronous=NORMAL")
+
+    SQLModel.metadata.create_all(engine, tables=[GameSession.__table__, GlobalCounter.__table__])
+    return engine
+
+
+class ShardSet:
+    """K SQLite files holding the game_sessions table, split by user_id, and game counters"""
+
+    def __init__(self, shard_count: int, shard_dir: str | None = None):
+        self.engines: List[Engine] = [
+            create_shard_engine(index, shard_dir) for index in range(shard_count)
+        ]
+
+    def engine_for(self, user_id: uuid.UUID) -> Engine:
+        """Engine of the shard holding a user's game sessions"""
+        return self.engines[shard_index(user_id, len(self.engines))]
+
+
+@lru_cache
+def get_shards() -> ShardSet:
+    """Return the configured game session shards"""
+    return ShardSet(settings.GAME_SHARDS)
@@ -0,0 +1,54 @@
+"""Startup warm-up module.
+
+Right after a deploy every cache is cold, so the first requests would all
+reach the database at once. Before serving, the lifespan seeds the global
+counters if needed and, when WARMUP_ENABLED, loads what the hottest routes
+read: the first leaderboard pages, the timers of the game sessions that can
+still be stopped and the token blacklist.
+"""
+import logging
+import time
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.counters import PLAYERS, is_seeded, seed_counters
+from app.core.database import engine
+from app.routers.auth.service import load_token_blacklist, user_db
+from app.routers.games.service import load_active_sessions, seed_game_counters
+from app.routers.leaderboard import warm_leaderboard
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_global_counters() -> None:
+    """Seed the global counters from full aggregates, once."""
+    with Session(engine) as db_session:
+        if not is_seeded(db_session, [PLAYERS]):
+            values = {PLAYERS: user_db.count(db_session=db_session)}
+            if seed_counters(db_session, values):
+                logger.info("Seeded global counters: %s", values)
+        if seed_game_counters(db_session):
+            logger.info("Seeded game counters")
+
+
+async def warm_up() -> None:
+    """Load the caches read by the hottest routes, when enabled."""
+    if not settings.WARMUP_ENABLED:
+        return
+    start = time.perf_counter()
+    try:
+        with Session(engine) as db_session:
+            sessions = load_active_sessions(db_session)
+            tokens = load_token_blacklist(db_session)
+        pages = await warm_leaderboard(settings.LEADERBOARD_WARMUP_PAGES)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Cache warm-up failed, starting with cold caches")
+        return
+    logger.info(
+        "Warmed up %d game sessions, %d blacklisted tokens and %d leaderboard pages in %.2f s",
+        sessions,
+        tokens,
+        pages,
+        time.perf_counter() - start,
+    )
@@ -2,11 +2,16 @@
 import logging
 from contextlib import asynccontextmanager
 
-import uvicorn
 from fastapi import FastAPI
 
+from app.core.admission import AdmissionMiddleware, admission_controller, loop_lag_monitor
+from app.core.config import settings
 from app.core.database import init_db
-from app.routers import auth, games, leaderboard, analytics
+from app.core.profiler import ProfilerMiddleware
+from app.core.warmup import ensure_global_counters, warm_up
+from app.routers import auth, games, leaderboard, analytics, metrics, admin
+from app.routers.games.service import start_result_journal, stop_result_journal
+from app.routers.leaderboard.snapshot import start_snapshot_builder, stop_snapshot_builder
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -18,7 +23,15 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Lifespan context manager"""
     init_db()
+    ensure_global_counters()
+    await start_result_journal()
+    await warm_up()
+    await start_snapshot_builder()
+    loop_lag_monitor.start()
     yield
+    await loop_lag_monitor.stop()
+    await stop_snapshot_builder()
+    await stop_result_journal()
 
 
 app = FastAPI(
@@ -28,10 +41,20 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission_controller,
+    retry_after_seconds=settings.ADMISSION_RETRY_AFTER_SECONDS,
+)
+if settings.PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
 app.include_router(router=auth.router)
 app.include_router(router=games.router)
 app.include_router(router=leaderboard.router)
 app.include_router(router=analytics.router)
+app.include_router(router=metrics.router)
+app.include_router(router=admin.router)
 
 
 @app.get("/")
@@ -41,4 +64,6 @@ async def root():
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -31,9 +31,11 @@ class User(TableBase, table=True):
     username: str = Field(unique=True, index=True)
     email: str = Field(unique=True, index=True)
     password_hash: str
+    token_generation: int = 0  # Bumped to revoke every token issued before
     # Relationships
     game_sessions: List["GameSession"] = Relationship(back_populates="user")
     token_blacklist: List["TokenBlacklist"] = Relationship(back_populates="user")
+    refresh_tokens: List["RefreshToken"] = Relationship(back_populates="user")
 
 
 class GameSession(TableBase, table=True):
@@ -60,3 +62,43 @@ class TokenBlacklist(TableBase, table=True):
     expires_at: datetime
     # Relationships
     user: User | None = Relationship(back_populates="token_blacklist")
+
+
+class RefreshToken(TableBase, table=True):
+    """Refresh token table"""
+
+    __tablename__ = "refresh_tokens"
+
+    token_jti: str = Field(unique=True, index=True)
+    family_id: uuid.UUID = Field(index=True)  # Shared by every rotation of a login
+    user_id: uuid.UUID = Field(foreign_key="users.id")
+    expires_at: datetime
+    used_at: datetime | None = None
+    revoked: bool = False
+    # Relationships
+    user: User | None = Relationship(back_populates="refresh_tokens")
+
+
+class PlayerStats(TableBase, table=True):
+    """Per-player game statistics, recomputed offline by app.scripts.recompute_stats"""
+
+    __tablename__ = "player_stats"
+
+    user_id: uuid.UUID = Field(foreign_key="users.id", unique=True, index=True)
+    completed_games: int
+    average_deviation_ms: float
+    best_deviation_ms: int
+    worst_deviation_ms: int
+    p50_deviation_ms: float
+    p90_deviation_ms: float
+    p99_deviation_ms: float
+    average_accuracy: float
+
+
+class GlobalCounter(TableBase, table=True):
+    """Global counter table, updated whenever the counted rows are written"""
+
+    __tablename__ = "global_counters"
+
+    name: str = Field(unique=True, index=True)
+    value: int = 0
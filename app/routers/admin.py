@@ -0,0 +1,51 @@
+"""Admin router module"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.dependencies import get_admin_user
+from app.core.profiler import profiler
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(get_admin_user)])
+
+
+def check_profiler() -> None:
+    """Reject profiling requests unless the profiler is enabled and idle"""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiler disabled")
+    if profiler.busy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="A profile is already being recorded"
+        )
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = Query(10, gt=0, le=120, description="Sampling duration")):
+    """Sample every request for a while and return collapsed stacks."""
+    check_profiler()
+    result = await profiler.profile(seconds)
+    return PlainTextResponse(result.collapsed(), headers={"X-Samples": str(result.samples)})
+
+
+@router.post("/profile/route", response_class=PlainTextResponse)
+async def profile_route(
+    request: Request,
+    path: str = Query(..., description="Route path, e.g. /games/{session_id}/stop"),
+    method: str = Query("GET", description="Route method"),
+    requests: int = Query(100, ge=1, le=10_000, description="Requests to sample"),
+    timeout_seconds: float = Query(60, gt=0, le=600, description="Give up after this long"),
+):
+    """Sample the next requests of a route and return collapsed stacks."""
+    check_profiler()
+    route = next(
+        (
+            route
+            for route in request.app.routes
+            if getattr(route, "path", None) == path and method.upper() in route.methods
+        ),
+        None,
+    )
+    if route is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+    result = await profiler.profile_route(route, requests=requests, timeout=timeout_seconds)
+    return PlainTextResponse(result.collapsed(), headers={"X-Samples": str(result.samples)})
@@ -2,15 +2,54 @@
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, func, select
+from sqlmodel import Session, select
 
+from app.core.config import settings
+from app.core.counters import DEVIATION_SUM, GAMES_PLAYED, PLAYERS, get_counters
 from app.core.database import get_session
 from app.core.dependencies import get_current_user
-from app.models import GameSession, GameStatus, User
-from app.routers.games.service import calculate_accuracy_percentage
-from app.schemas import GameSessionResponse, UserStats
+from app.core.rate_limit import TokenBucketLimiter, rate_limit, token_user_id
+from app.models import PlayerStats, User
+from app.routers.games.service import (
+    calculate_accuracy_percentage,
+    get_game_counters,
+    get_recent_results,
+)
+from app.schemas import DeviationPercentiles, GameSessionResponse, GlobalStats, UserStats
 
-router = APIRouter(prefix="/analytics", tags=["Analytics"])
+limiter = TokenBucketLimiter(
+    name="analytics",
+    per_minute=settings.RATE_LIMIT_ANALYTICS_PER_MINUTE,
+    burst=settings.RATE_LIMIT_ANALYTICS_BURST,
+)
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"],
+    dependencies=[Depends(rate_limit(limiter, token_user_id))],
+)
+
+
+@router.get("/global", response_model=GlobalStats)
+async def get_global_stats(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Get totals over every player, from counters kept up to date by each write."""
+    counters = {**get_counters(session), **get_game_counters(session)}
+    total_games = counters[GAMES_PLAYED]
+    if total_games > 0:
+        avg_deviation = counters[DEVIATION_SUM] / total_games
+        avg_accuracy = calculate_accuracy_percentage(int(avg_deviation))
+    else:
+        avg_deviation = None
+        avg_accuracy = None
+
+    return GlobalStats(
+        total_players=counters[PLAYERS],
+        total_games=total_games,
+        average_deviation_ms=round(avg_deviation, 2) if avg_deviation is not None else None,
+        average_accuracy=avg_accuracy,
+    )
 
 
 @router.get("/user/{user_id}", response_model=UserStats)
@@ -24,53 +63,50 @@ async def get_user_stats(
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    # Get all game sessions
-    all_sessions = session.exec(
-        select(GameSession)
-        .where(GameSession.user_id == user_id)
-        .order_by(GameSession.created_at.desc())
-    ).all()
+    # Get totals and recent games, from memory when up to date
+    totals, recent = get_recent_results(db_session=session, user_id=user_id)
 
-    # Get completed sessions for statistics
-    completed_sessions = [s for s in all_sessions if s.status == GameStatus.COMPLETED]
+    # Percentiles are only computed offline, by app.scripts.recompute_stats
+    player_stats = session.exec(select(PlayerStats).where(PlayerStats.user_id == user_id)).first()
 
     # Calculate statistics
-    total_games = len(all_sessions)
-    completed_games = len(completed_sessions)
-
-    if completed_games > 0:
-        deviations = [s.deviation_ms for s in completed_sessions]
-        avg_deviation = sum(deviations) / len(deviations)
-        best_deviation = min(deviations)
-        worst_deviation = max(deviations)
+    if totals.completed_games > 0:
+        avg_deviation = totals.deviation_sum / totals.completed_games
         avg_accuracy = calculate_accuracy_percentage(int(avg_deviation))
     else:
         avg_deviation = None
-        best_deviation = None
-        worst_deviation = None
         avg_accuracy = None
 
-    # Get recent games (last 10)
     recent_games = [
         GameSessionResponse(
-            id=s.id,
-            start_time=s.start_time,
-            stop_time=s.stop_time,
-            duration_ms=s.duration_ms,
-            deviation_ms=s.deviation_ms,
-            status=s.status,
+            id=game.id,
+            start_time=game.start_time,
+            stop_time=game.stop_time,
+            duration_ms=game.duration_ms,
+            deviation_ms=game.deviation_ms,
+            status=game.status,
         )
-        for s in all_sessions[:10]
+        for game in recent
     ]
 
     return UserStats(
         user_id=user.id,
         username=user.username,
-        total_games=total_games,
-        completed_games=completed_games,
+        total_games=totals.total_games,
+        completed_games=totals.completed_games,
         average_deviation_ms=round(avg_deviation, 2) if avg_deviation else None,
-        best_deviation_ms=best_deviation,
-        worst_deviation_ms=worst_deviation,
+        best_deviation_ms=totals.best_deviation_ms,
+        worst_deviation_ms=totals.worst_deviation_ms,
         average_accuracy=avg_accuracy,
         recent_games=recent_games,
+        deviation_percentiles=(
+            DeviationPercentiles(
+                p50_deviation_ms=player_stats.p50_deviation_ms,
+                p90_deviation_ms=player_stats.p90_deviation_ms,
+                p99_deviation_ms=player_stats.p99_deviation_ms,
+                computed_at=player_stats.updated_at,
+            )
+            if player_stats
+            else None
+        ),
     )
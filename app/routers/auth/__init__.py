@@ -1,6 +1,7 @@
 """Authentication module"""
 
 import logging
+import uuid
 from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -9,19 +10,32 @@ from sqlmodel import Session
 
 from app.core.config import settings
 from app.core.database import get_session
+from app.core.rate_limit import TokenBucketLimiter, client_ip, rate_limit
 from app.models import User
 from app.routers.auth.service import (
+    access_token_claims,
     authenticate_user,
     create_access_token,
+    create_refresh_token,
     create_user,
     logout_user,
+    rotate_refresh_token,
     verify_token,
 )
-from app.schemas import CustomResponse, Token, UserSignUp
+from app.schemas import CustomResponse, RefreshRequest, Token, UserSignUp
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/auth", tags=["authentication"])
+limiter = TokenBucketLimiter(
+    name="auth",
+    per_minute=settings.RATE_LIMIT_AUTH_PER_MINUTE,
+    burst=settings.RATE_LIMIT_AUTH_BURST,
+)
+router = APIRouter(
+    prefix="/auth",
+    tags=["authentication"],
+    dependencies=[Depends(rate_limit(limiter, client_ip))],
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
@@ -55,11 +69,28 @@ async def login(
         )
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    family_id = uuid.uuid4()
     access_token, _ = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=access_token_claims(user, family_id=family_id), expires_delta=access_token_expires
     )
+    refresh_token = create_refresh_token(user, session, family_id=family_id)
+
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(form: RefreshRequest, session: Session = Depends(get_session)):
+    """Exchange a refresh token for a new access token, rotating the refresh token."""
+    tokens = await rotate_refresh_token(form.refresh_token, session)
+    if not tokens:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-    return {"access_token": access_token, "token_type": "bearer"}
+    access_token, refresh_token = tokens
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
 
 
 @router.post("/logout", response_model=CustomResponse)
@@ -76,3 +107,19 @@ async def logout(
         )
 
     return CustomResponse(message="Successfully logged out")
+
+
+@router.post("/logout/all", response_model=CustomResponse)
+async def logout_everywhere(
+    session: Session = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+):
+    """Logout user from every device by revoking all their tokens."""
+    success = await logout_user(token, session, everywhere=True)
+
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to logout. Invalid token."
+        )
+
+    return CustomResponse(message="Successfully logged out everywhere")
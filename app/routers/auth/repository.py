@@ -1,10 +1,13 @@
 """Repository layer"""
-from typing import List
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
 
-from sqlmodel import Session, select
+from sqlalchemy import update
+from sqlmodel import Session, func, select
 
 from app.core.repository import AbstractRepository, AbstractRepositoryUsers
-from app.models import TokenBlacklist, User
+from app.models import RefreshToken, TokenBlacklist, User
 
 
 class UserRepository(AbstractRepositoryUsers[User]):
@@ -35,11 +38,52 @@ class UserRepository(AbstractRepositoryUsers[User]):
         db_session.refresh(item)
         return item
 
+    def create_many(self, items: List[User], db_session: Session) -> List[User]:
+        """Create several users in a single transaction"""
+        db_session.add_all(items)
+        db_session.commit()
+        return items
+
+    def get_existing_emails(self, emails: Iterable[str], db_session: Session) -> Set[str]:
+        """Return which of the given emails are already registered"""
+        statement = select(User.email).where(User.email.in_(list(emails)))
+        return set(db_session.exec(statement).all())
+
+    def get_existing_usernames(self, usernames: Iterable[str], db_session: Session) -> Set[str]:
+        """Return which of the given usernames are already taken"""
+        statement = select(User.username).where(User.username.in_(list(usernames)))
+        return set(db_session.exec(statement).all())
+
+    def increment_token_generation(self, item_id, db_session: Session) -> int:
+        """Bump the token generation of a user and return the new value"""
+        db_session.exec(
+            update(User)
+            .where(User.id == item_id)
+            .values(token_generation=User.token_generation + 1, updated_at=datetime.utcnow())
+        )
+        db_session.commit()
+        statement = select(User.token_generation).where(User.id == item_id)
+        return db_session.exec(statement).one()
+
+    def get_usernames(self, item_ids: Iterable[uuid.UUID], db_session: Session) -> Dict:
+        """Map user IDs to usernames"""
+        statement = select(User.id, User.username).where(User.id.in_(list(item_ids)))
+        return dict(db_session.exec(statement).all())
+
+    def count(self, db_session: Session) -> int:
+        """Count users"""
+        return db_session.exec(select(func.count(User.id))).one()
+
     def get_all(self, db_session: Session) -> List[User]:
         """List all users"""
 
     def update(self, updated_item: User, db_session: Session) -> User:
         """Update user"""
+        updated_item.updated_at = datetime.utcnow()
+        db_session.add(updated_item)
+        db_session.commit()
+        db_session.refresh(updated_item)
+        return updated_item
 
     def delete(self, item: User, db_session: Session) -> User:
         """Delete user"""
@@ -61,6 +105,13 @@ class TokenBlacklistRepository(AbstractRepository[TokenBlacklist]):
         result = db_session.exec(statement)
         return result.first()
 
+    def get_unexpired(self, now: datetime, db_session: Session) -> List[Tuple[str, datetime]]:
+        """List the JWT IDs and expiry of blacklisted tokens that have not expired"""
+        statement = select(TokenBlacklist.token_jti, TokenBlacklist.expires_at).where(
+            TokenBlacklist.expires_at > now
+        )
+        return list(db_session.exec(statement).all())
+
     def get_all(self, db_session: Session) -> List[TokenBlacklist]:
         """List blacklisted tokens"""
 
@@ -69,3 +120,57 @@ class TokenBlacklistRepository(AbstractRepository[TokenBlacklist]):
 
     def delete(self, item: TokenBlacklist, db_session: Session) -> TokenBlacklist:
         """Delete blacklisted token"""
+
+
+class RefreshTokenRepository(AbstractRepository[RefreshToken]):
+    """Refresh token repository"""
+
+    def create(self, item: RefreshToken, db_session: Session) -> RefreshToken:
+        """Record refresh token"""
+        db_session.add(item)
+        db_session.commit()
+        db_session.refresh(item)
+        return item
+
+    def get(self, item_id, db_session: Session) -> RefreshToken | None:
+        """Get refresh token by JWT ID"""
+        statement = select(RefreshToken).where(RefreshToken.token_jti == item_id)
+        result = db_session.exec(statement)
+        return result.first()
+
+    def mark_used(self, item_id, db_session: Session) -> bool:
+        """Mark an unused refresh token as used, False if it was already used"""
+        result = db_session.exec(
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_jti == item_id,
+                RefreshToken.used_at.is_(None),
+                RefreshToken.revoked.is_(False),
+            )
+            .values(used_at=datetime.utcnow())
+        )
+        db_session.commit()
+        return result.rowcount > 0
+
+    def revoke_family(self, family_id: uuid.UUID, db_session: Session) -> None:
+        """Revoke every refresh token of a family"""
+        db_session.exec(
+            update(RefreshToken).where(RefreshToken.family_id == family_id).values(revoked=True)
+        )
+        db_session.commit()
+
+    def revoke_user(self, user_id: uuid.UUID, db_session: Session) -> None:
+        """Revoke every refresh token of a user"""
+        db_session.exec(
+            update(RefreshToken).where(RefreshToken.user_id == user_id).values(revoked=True)
+        )
+        db_session.commit()
+
+    def get_all(self, db_session: Session) -> List[RefreshToken]:
+        """List refresh tokens"""
+
+    def update(self, updated_item: RefreshToken, db_session: Session) -> RefreshToken:
+        """Update refresh token"""
+
+    def delete(self, item: RefreshToken, db_session: Session) -> RefreshToken:
+        """Delete refresh token"""
@@ -1,39 +1,79 @@
 """Authentication Service module"""
 
+import logging
 import uuid
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 
 from fastapi import HTTPException, status
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlmodel import Session
 
+from app.core.cache import get_cache
 from app.core.config import settings
-from app.models import TokenBlacklist, User
-from app.routers.auth.repository import TokenBlacklistRepository, UserRepository
+from app.core.counters import PLAYERS, stage_counters
+from app.core.profiler import span
+from app.models import RefreshToken, TokenBlacklist, User
+from app.routers.auth.repository import (
+    RefreshTokenRepository,
+    TokenBlacklistRepository,
+    UserRepository,
+)
 from app.schemas import TokenData, UserSignUp
 
+logger = logging.getLogger(__name__)
+
 user_db = UserRepository()
 token_blacklist_db = TokenBlacklistRepository()
+refresh_token_db = RefreshTokenRepository()
+
+REFRESH_TOKEN_TYPE = "refresh"
+BLACKLIST_LOADED_TTL_SECONDS = 24 * 3600
+
 
+# Password hashing and JWT libraries are imported on first use to keep startup fast
+@lru_cache
+def get_pwd_context():
+    """Return the password hashing context.
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    Hashes made with any other cost than BCRYPT_ROUNDS are flagged as needing
+    an update, so they migrate to the configured cost on the next login.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+    )
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with span("auth.bcrypt_verify"):
+        return get_pwd_context().verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Verify a password, returning a new hash too when the stored one is outdated."""
+    with span("auth.bcrypt_verify"):
+        return get_pwd_context().verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password."""
-    return pwd_context.hash(password)
+    with span("auth.bcrypt_hash"):
+        return get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token with JWT ID."""
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -43,27 +83,192 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     # Add JWT ID for token tracking
     jti = str(uuid.uuid4())
     to_encode.update({"exp": expire, "jti": jti})
-    encoded_jwt = jwt.encode(to_encode, key=settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    with span("auth.jwt_encode"):
+        encoded_jwt = jwt.encode(to_encode, key=settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt, jti
 
 
+def access_token_claims(user: User, family_id: Optional[uuid.UUID] = None) -> dict:
+    """Claims identifying a user, and the login it belongs to, in an access token."""
+    claims = {"sub": user.email, "uid": str(user.id), "gen": user.token_generation}
+    if family_id:
+        claims["fam"] = str(family_id)
+    return claims
+
+
+def decode_token(token: str, credentials_exception) -> dict:
+    """Check the signature of a JWT token and return its claims."""
+    from jose import JWTError, jwt
+
+    try:
+        with span("auth.jwt_decode"):
+            payload = jwt.decode(token, key=settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError as error:
+        raise credentials_exception from error
+    if payload.get("sub") is None or payload.get("typ") == REFRESH_TOKEN_TYPE:
+        raise credentials_exception
+    return payload
+
+
+def create_refresh_token(
+    user: User, session: Session, family_id: Optional[uuid.UUID] = None
+) -> str:
+    """Create a refresh token, starting a new rotation family unless one is given."""
+    from jose import jwt
+
+    expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    jti = str(uuid.uuid4())
+    family_id = family_id or uuid.uuid4()
+    refresh_token_db.create(
+        item=RefreshToken(token_jti=jti, family_id=family_id, user_id=user.id, expires_at=expire),
+        db_session=session,
+    )
+    to_encode = {
+        "sub": user.email,
+        "exp": expire,
+        "jti": jti,
+        "typ": REFRESH_TOKEN_TYPE,
+        "fam": str(family_id),
+        "gen": user.token_generation,
+    }
+    return jwt.encode(to_encode, key=settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+async def rotate_refresh_token(refresh_token: str, session: Session) -> Optional[tuple[str, str]]:
+    """Exchange a refresh token for a new access token and refresh token.
+
+    Only the signature and one indexed lookup are needed, no password check.
+    Presenting an already used refresh token revokes its whole family, since
+    it means the token was stolen or replayed.
+    """
+    from jose import JWTError, jwt
+
+    try:
+        payload = jwt.decode(
+            refresh_token, key=settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except JWTError:
+        return None
+    if payload.get("typ") != REFRESH_TOKEN_TYPE or not payload.get("jti"):
+        return None
+
+    stored = refresh_token_db.get(item_id=payload["jti"], db_session=session)
+    if not stored or stored.revoked:
+        return None
+    if not refresh_token_db.mark_used(item_id=stored.token_jti, db_session=session):
+        logger.warning("Refresh token reuse detected, revoking family %s", stored.family_id)
+        refresh_token_db.revoke_family(family_id=stored.family_id, db_session=session)
+        return None
+
+    user = user_db.get(item_id=stored.user_id, db_session=session)
+    if not user or payload.get("gen", 0) != user.token_generation:
+        return None
+
+    access_token, _ = create_access_token(
+        data=access_token_claims(user, family_id=stored.family_id)
+    )
+    new_refresh_token = create_refresh_token(user, session, family_id=stored.family_id)
+    return access_token, new_refresh_token
+
+
+async def verify_token_payload(payload: dict, credentials_exception, session: Session = None):
+    """Verify the claims of a decoded JWT token."""
+    # Logging out everywhere bumps the generation in both revocation modes
+    if "gen" in payload:
+        await verify_token_generation(payload, credentials_exception, session)
+        if settings.TOKEN_REVOCATION_MODE == "generation":
+            return TokenData(email=payload.get("sub"))
+
+    # Check if token is blacklisted
+    jti = payload.get("jti")
+    if jti and await is_token_blacklisted(jti, session=session):
+        raise credentials_exception
+
+    token_data = TokenData(email=payload.get("sub"))
+    return token_data
+
+
 async def verify_token(token: str, credentials_exception, session: Session = None):
     """Verify and decode a JWT token."""
-    try:
-        payload = jwt.decode(token, key=settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+    payload = decode_token(token, credentials_exception)
+    return await verify_token_payload(payload, credentials_exception, session)
 
-        # Check if token is blacklisted
-        jti = payload.get("jti")
-        if jti and await is_token_blacklisted(jti, session=session):
-            raise credentials_exception
 
-        token_data = TokenData(email=email)
-        return token_data
-    except JWTError as error:
+def token_generation_ttl(cache) -> float:
+    """How long a token generation may be cached.
+
+    A per-process cache is not told about logouts handled by other workers,
+    so it only keeps generations briefly.
+    """
+    if cache.shared:
+        return settings.TOKEN_GENERATION_CACHE_TTL_SECONDS
+    return min(
+        settings.TOKEN_GENERATION_CACHE_TTL_SECONDS,
+        settings.TOKEN_GENERATION_LOCAL_CACHE_TTL_SECONDS,
+    )
+
+
+async def get_token_generation(user_id: uuid.UUID, session: Session) -> Optional[int]:
+    """Get the current token generation of a user, cached."""
+    cache = get_cache()
+    generation = cache.get(f"token_gen:{user_id}")
+    if generation is None:
+        user = user_db.get(item_id=user_id, db_session=session)
+        if not user:
+            return None
+        generation = user.token_generation
+        cache.set(f"token_gen:{user_id}", generation, ttl_seconds=token_generation_ttl(cache))
+    return generation
+
+
+async def verify_token_generation(payload: dict, credentials_exception, session: Session):
+    """Reject tokens issued before the user's last logout."""
+    try:
+        user_id = uuid.UUID(payload["uid"])
+    except (KeyError, ValueError) as error:
         raise credentials_exception from error
+    if payload.get("gen") != await get_token_generation(user_id, session):
+        raise credentials_exception
+
+
+async def revoke_user_tokens(user: User, session: Session) -> int:
+    """Revoke every token of a user by bumping their token generation."""
+    generation = user_db.increment_token_generation(item_id=user.id, db_session=session)
+    cache = get_cache()
+    cache.set(f"token_gen:{user.id}", generation, ttl_seconds=token_generation_ttl(cache))
+    return generation
+
+
+def get_cached_user(token_jti: str) -> Optional[User]:
+    """Get the user of an already verified token.
+
+    The user is detached from any database session and meant for reading only.
+    Verified tokens are only cached in a cache shared by every worker, so a
+    logout on one worker revokes the token on all of them.
+    """
+    cache = get_cache()
+    if not cache.shared:
+        return None
+    data = cache.get(f"auth:{token_jti}")
+    if data is None:
+        return None
+    return User(id=uuid.UUID(data["id"]), username=data["username"], email=data["email"])
+
+
+def cache_user(token_jti: str, user: User, expires_at: datetime) -> None:
+    """Remember the user of a verified token until it expires or is revoked."""
+    cache = get_cache()
+    if not cache.shared:
+        return
+    ttl_seconds = min(
+        settings.AUTH_CACHE_TTL_SECONDS, (expires_at - datetime.utcnow()).total_seconds()
+    )
+    if ttl_seconds > 0:
+        cache.set(
+            f"auth:{token_jti}",
+            {"id": str(user.id), "username": user.username, "email": user.email},
+            ttl_seconds=ttl_seconds,
+        )
 
 
 async def authenticate_user(email: str, password: str, session: Session) -> Optional[User]:
@@ -71,8 +276,13 @@ async def authenticate_user(email: str, password: str, session: Session) -> Opti
     user = user_db.get_by_email(email=email, db_session=session)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = verify_and_update_password(password, user.password_hash)
+    if not valid:
         return None
+    if new_hash:
+        # Transparently migrate the hash to the configured bcrypt cost
+        user.password_hash = new_hash
+        user = user_db.update(updated_item=user, db_session=session)
     return user
 
 
@@ -98,7 +308,8 @@ def create_user(user_create: UserSignUp, session: Session) -> User:
             status_code=status.HTTP_400_BAD_REQUEST, detail="Username already taken"
         )
 
-    # Create new user
+    # Create new user, counted in the same transaction
+    stage_counters(session, {PLAYERS: 1})
     user = user_db.create(
         item=User(
             email=user_create.email,
@@ -120,17 +331,64 @@ async def add_token_to_blacklist(
         return False
     blacklisted_token = TokenBlacklist(token_jti=token_jti, user_id=user_id, expires_at=expires_at)
     result = token_blacklist_db.create(item=blacklisted_token, db_session=session)
+    cache_blacklisted_token(token_jti, expires_at)
     return result is not None
 
 
+def cache_blacklisted_token(token_jti: str, expires_at: datetime) -> None:
+    """Remember a blacklisted token until it expires."""
+    ttl_seconds = (expires_at - datetime.utcnow()).total_seconds()
+    if ttl_seconds > 0:
+        get_cache().set(f"blacklist:{token_jti}", True, ttl_seconds=ttl_seconds)
+
+
 async def is_token_blacklisted(token_jti: str, session: Session) -> bool:
-    """Check if a token is blacklisted."""
+    """Check if a token is blacklisted.
+
+    Once the blacklist is loaded into a cache shared by every worker, the
+    cache holds every blacklisted token and a miss needs no database lookup.
+    """
+    cache = get_cache()
+    if cache.get(f"blacklist:{token_jti}"):
+        return True
+    if cache.shared and cache.get("blacklist:loaded"):
+        return False
     blacklisted_token = token_blacklist_db.get(item_id=token_jti, db_session=session)
     return blacklisted_token is not None
 
 
-async def logout_user(token: str, session: Session) -> bool:
-    """Logout user by blacklisting their token."""
+def load_token_blacklist(session: Session) -> int:
+    """Cache every unexpired blacklisted token, returning how many there are."""
+    tokens = token_blacklist_db.get_unexpired(now=datetime.utcnow(), db_session=session)
+    for token_jti, expires_at in tokens:
+        cache_blacklisted_token(token_jti, expires_at)
+    get_cache().set("blacklist:loaded", True, ttl_seconds=BLACKLIST_LOADED_TTL_SECONDS)
+    return len(tokens)
+
+
+def revoke_login_refresh_tokens(payload: dict, user: User, session: Session) -> None:
+    """Revoke the refresh tokens of the login an access token was issued to.
+
+    Access tokens issued before they carried their refresh family revoke
+    every refresh token of the user.
+    """
+    try:
+        family_id = uuid.UUID(payload["fam"])
+    except (KeyError, ValueError):
+        refresh_token_db.revoke_user(user_id=user.id, db_session=session)
+        return
+    refresh_token_db.revoke_family(family_id=family_id, db_session=session)
+
+
+async def logout_user(token: str, session: Session, everywhere: bool = False) -> bool:
+    """Logout user by blacklisting their token.
+
+    In "generation" revocation mode, or when logging out everywhere, the
+    user's token generation is bumped instead, which revokes all their tokens.
+    Refresh tokens honour the generation in both modes.
+    """
+    from jose import JWTError, jwt
+
     try:
         # Decode token to get JWT ID and expiration
         payload = jwt.decode(token, key=settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -152,9 +410,17 @@ async def logout_user(token: str, session: Session) -> bool:
         if not user:
             return False
 
+        get_cache().delete(f"auth:{jti}")
+        # End the login's refresh tokens too, or the client could mint new access tokens
+        revoke_login_refresh_tokens(payload, user, session=session)
+        if everywhere or settings.TOKEN_REVOCATION_MODE == "generation":
+            await revoke_user_tokens(user, session=session)
+            if settings.TOKEN_REVOCATION_MODE == "generation":
+                return True
+
         # Add token to blacklist
         result = await add_token_to_blacklist(jti, user.id, expires_at, session=session)
-        return result
+        return result or everywhere
 
     except JWTError:
         return False
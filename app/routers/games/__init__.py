@@ -2,26 +2,54 @@
 import uuid
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlmodel import Session
 
+from app.core.config import settings
 from app.core.database import get_session
 from app.core.dependencies import get_current_user
-from app.models import GameSession, GameStatus, User
+from app.core.rate_limit import TokenBucketLimiter, rate_limit, token_user_id
+from app.models import GameStatus, User
 from app.routers.games.service import (
-    calculate_accuracy_percentage,
-    calculate_deviation_ms,
+    build_stop_response,
     calculate_duration_ms,
-    create_game_session,
-    get_performance_message,
+    claim_game_result,
+    complete_game_session,
+    expire_game_session,
     get_session_by_id,
     get_session_by_user,
+    get_session_timing,
+    get_sessions_by_ids,
+    get_stop_result,
+    is_result_pending,
     is_session_expired,
+    measure_game_session,
+    record_game_result,
+    release_game_result,
+    save_game_sessions,
+    save_stop_result,
+    start_game_session,
     update_game_session_status,
 )
-from app.schemas import CustomResponse, GameStartResponse, GameStopResponse
+from app.schemas import (
+    CustomResponse,
+    GameStartResponse,
+    GameStopBatchRequest,
+    GameStopBatchResponse,
+    GameStopBatchResult,
+    GameStopResponse,
+)
 
-router = APIRouter(prefix="/games", tags=["Games"])
+limiter = TokenBucketLimiter(
+    name="games",
+    per_minute=settings.RATE_LIMIT_GAMES_PER_MINUTE,
+    burst=settings.RATE_LIMIT_GAMES_BURST,
+)
+router = APIRouter(
+    prefix="/games",
+    tags=["Games"],
+    dependencies=[Depends(rate_limit(limiter, token_user_id))],
+)
 
 
 @router.post("/start", response_model=GameStartResponse)
@@ -42,14 +70,90 @@ async def start_game(
                 detail=f"You already have an active game session (ID: {active_session.id})",
             )
 
-    game_session = create_game_session(
-        game_session=GameSession(
-            user_id=current_user.id, start_time=datetime.utcnow(), status=GameStatus.STARTED
-        ),
+    game_session = start_game_session(user=current_user, db_session=db_session)
+
+    return GameStartResponse(session_id=game_session.id, start_time=game_session.start_time)
+
+
+@router.post("/stop:batch", response_model=GameStopBatchResponse)
+async def stop_games_batch(
+    batch: GameStopBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db_session: Session = Depends(get_session),
+):
+    """Stop several games in a single transaction, timed by the server."""
+    if len(batch.items) > settings.STOP_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.STOP_BATCH_MAX_SIZE} games",
+        )
+
+    game_sessions = await get_sessions_by_ids(
         db_session=db_session,
+        game_ids=[item.session_id for item in batch.items],
+        user_id=current_user.id,
     )
+    now = datetime.utcnow()
+    results = []
+    stopped = []
+    changed = []
+    claimed = []
+
+    for item in batch.items:
+        if item.idempotency_key:
+            previous = get_stop_result(current_user.id, item.session_id, item.idempotency_key)
+            if previous:
+                results.append(GameStopBatchResult(session_id=item.session_id, result=previous))
+                continue
+
+        game_session = game_sessions.get(item.session_id)
+        error = None
+        if (
+            not game_session
+            or game_session.status != GameStatus.STARTED
+            or is_result_pending(item.session_id)
+        ):
+            error = "Game session not found"
+        elif game_session.user_id != current_user.id:
+            error = "You can only stop your own game sessions"
+        elif not claim_game_result(item.session_id):
+            error = "Game session not found"
+        else:
+            claimed.append(item.session_id)
+            # Games are always timed by the server, never from client clocks
+            stop_time, duration_ms = now, None
+            timing = get_session_timing(item.session_id)
+            if timing and timing.user_id == current_user.id:
+                stop_time, duration_ms = measure_game_session(timing)
+            if is_session_expired(game_session.start_time, now=stop_time):
+                game_session.status = GameStatus.EXPIRED
+                changed.append(game_session)
+                error = "This game session has expired"
+
+        if error:
+            results.append(GameStopBatchResult(session_id=item.session_id, error=error))
+            continue
+
+        result = complete_game_session(
+            game_session=game_session, stop_time=stop_time, duration_ms=duration_ms
+        )
+        changed.append(game_session)
+        stopped.append((item, result))
+        results.append(GameStopBatchResult(session_id=item.session_id, result=result))
 
-    return GameStartResponse(session_id=game_session.id, start_time=game_session.start_time)
+    try:
+        if changed:
+            save_game_sessions(db_session=db_session, game_sessions=changed)
+    finally:
+        # Saved directly, so nothing is left pending in the journal
+        for game_id in claimed:
+            release_game_result(game_id)
+
+    for item, result in stopped:
+        if item.idempotency_key:
+            save_stop_result(current_user.id, item.idempotency_key, result)
+
+    return GameStopBatchResponse(results=results)
 
 
 @router.post("/{session_id}/stop", response_model=GameStopResponse)
@@ -57,55 +161,74 @@ async def stop_game(
     session_id: uuid.UUID,
     current_user: User = Depends(get_current_user),
     db_session: Session = Depends(get_session),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
 ):
     """Stop a game."""
-    game_session = await get_session_by_id(db_session=db_session, game_id=session_id)
+    if idempotency_key:
+        previous = get_stop_result(current_user.id, session_id, idempotency_key)
+        if previous:
+            return previous
+
+    timing = get_session_timing(session_id)
+    if timing and timing.user_id == current_user.id:
+        # Score from the in-process monotonic clock, no read needed
+        stop_time, duration_ms = measure_game_session(timing)
+        if is_session_expired(timing.start_time, now=stop_time):
+            expire_game_session(
+                db_session=db_session, game_id=session_id, user_id=timing.user_id
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="This game session has expired"
+            )
+    else:
+        # Fall back to the persisted start time, e.g. after a restart
+        game_session = await get_session_by_id(
+            db_session=db_session, game_id=session_id, user_id=current_user.id
+        )
 
-    if not game_session:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Game session not found")
+        if not game_session or is_result_pending(session_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Game session not found"
+            )
 
-    # Verify ownership
-    if game_session.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only stop your own game sessions",
-        )
+        # Verify ownership
+        if game_session.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only stop your own game sessions",
+            )
 
-    # Check if already completed
-    if game_session.status == GameStatus.COMPLETED:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="This game session has already been completed",
-        )
+        # Check if already completed
+        if game_session.status == GameStatus.COMPLETED:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="This game session has already been completed",
+            )
 
-    # Check if expired
-    if is_session_expired(game_session.start_time):
-        game_session.status = GameStatus.EXPIRED
-        db_session.add(game_session)
-        db_session.commit()
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="This game session has expired"
-        )
+        # Check if expired
+        if is_session_expired(game_session.start_time):
+            update_game_session_status(
+                game_session=game_session, status=GameStatus.EXPIRED, db_session=db_session
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="This game session has expired"
+            )
 
-    # Calculate results
-    stop_time = datetime.utcnow()
-    duration_ms = calculate_duration_ms(game_session.start_time, stop_time)
-    deviation_ms = calculate_deviation_ms(duration_ms)
-    accuracy = calculate_accuracy_percentage(deviation_ms)
-
-    # Update game session
-    game_session.stop_time = stop_time
-    game_session.duration_ms = duration_ms
-    game_session.deviation_ms = deviation_ms
-    game_session.status = GameStatus.COMPLETED
-
-    db_session.add(game_session)
-    db_session.commit()
-
-    return GameStopResponse(
-        session_id=game_session.id,
-        duration_ms=duration_ms,
-        deviation_ms=deviation_ms,
-        accuracy_percentage=accuracy,
-        message=get_performance_message(deviation_ms),
-    )
+        stop_time = datetime.utcnow()
+        duration_ms = calculate_duration_ms(game_session.start_time, stop_time)
+
+    # Calculate results and save them
+    result = build_stop_response(game_id=session_id, duration_ms=duration_ms)
+    if not await record_game_result(
+        db_session=db_session,
+        game_id=session_id,
+        user_id=current_user.id,
+        stop_time=stop_time,
+        result=result,
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Game session not found")
+
+    if idempotency_key:
+        save_stop_result(current_user.id, idempotency_key, result)
+
+    return result
@@ -0,0 +1,242 @@
+"""Game result journal module.
+
+Completed games can be acknowledged once they are durable in an append-only
+journal instead of after a full database transaction. Records are
+fixed-size and written with group-committed fsync; a background applier
+copies them into the database and advances an "applied" offset kept next to
+the journal. Applying a record only updates a game session that is still
+STARTED, so replaying records after a crash never applies a result twice.
+
+Every worker process owns one journal file, locked for as long as it runs.
+On startup, journals left behind by dead processes are replayed and removed.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import threading
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Set
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+RECORD_BODY = struct.Struct("<16s16sqqq")
+RECORD_SIZE = RECORD_BODY.size + 4  # Body and CRC32
+
+
+class GameResult(NamedTuple):
+    """Result of a completed game, as stored in the journal"""
+
+    session_id: uuid.UUID
+    user_id: uuid.UUID
+    duration_ms: int
+    deviation_ms: int
+    stop_time: datetime
+
+
+def pack_result(result: GameResult) -> bytes:
+    """Encode a result as a fixed-size record"""
+    body = RECORD_BODY.pack(
+        result.session_id.bytes,
+        result.user_id.bytes,
+        result.duration_ms,
+        result.deviation_ms,
+        (result.stop_time - EPOCH) // timedelta(microseconds=1),
+    )
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def unpack_result(record: bytes) -> GameResult | None:
+    """Decode a record, or None when it is torn or corrupt"""
+    body, (crc,) = record[: RECORD_BODY.size], struct.unpack("<I", record[RECORD_BODY.size :])
+    if zlib.crc32(body) != crc:
+        return None
+    session_id, user_id, duration_ms, deviation_ms, stop_us = RECORD_BODY.unpack(body)
+    return GameResult(
+        uuid.UUID(bytes=session_id),
+        uuid.UUID(bytes=user_id),
+        duration_ms,
+        deviation_ms,
+        EPOCH + timedelta(microseconds=stop_us),
+    )
+
+
+def read_results(path: Path, offset: int, limit: int) -> tuple[List[GameResult], int]:
+    """Read up to limit whole, valid records from an offset, returning the new offset"""
+    with path.open("rb") as file:
+        file.seek(offset)
+        data = file.read(RECORD_SIZE * limit)
+    results = []
+    for start in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+        result = unpack_result(data[start : start + RECORD_SIZE])
+        if result is None:
+            break
+        results.append(result)
+    return results, offset + len(results) * RECORD_SIZE
+
+
+class ResultJournal:
+    """Append-only journal of game results owned by this process"""
+
+    def __init__(
+        self,
+        directory: str,
+        apply: Callable[[List[GameResult]], None],
+        flush_interval_ms: int,
+        apply_interval_ms: int,
+        apply_batch: int,
+        compact_bytes: int,
+    ):
+        self.directory = Path(directory)
+        self.path: Path | None = None  # Named after the process that starts the journal
+        self.apply = apply
+        self.flush_interval = flush_interval_ms / 1000
+        self.apply_interval = apply_interval_ms / 1000
+        self.apply_batch = apply_batch
+        self.compact_bytes = compact_bytes
+        self.pending: Set[uuid.UUID] = set()
+        self._fd: int | None = None
+        self._buffer = bytearray()
+        self._waiters: List[asyncio.Future] = []
+        self._wakeup = asyncio.Event()
+        self._write_lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Replay orphaned journals, then open this process's journal"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(self.recover_orphans)
+        self.path = self.directory / f"results-{os.getpid()}.journal"
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._tasks = [
+            asyncio.create_task(self._run_flusher()),
+            asyncio.create_task(self._run_applier()),
+        ]
+
+    async def stop(self) -> None:
+        """Flush and apply everything, then close the journal"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._flush()
+        await asyncio.to_thread(self.apply_all, self.path)
+        os.close(self._fd)
+        self._fd = None
+
+    async def append(self, result: GameResult) -> None:
+        """Write a result, returning once it is durable"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._buffer += pack_result(result)
+        self._waiters.append(waiter)
+        self.pending.add(result.session_id)
+        self._wakeup.set()
+        await waiter
+
+    def recover_orphans(self) -> None:
+        """Replay and remove journals of processes that are gone"""
+        for path in self.directory.glob("results-*.journal"):
+            with path.open("rb+") as file:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Owned by a live worker
+                logger.info("Replaying game result journal %s", path)
+                self.apply_all(path)
+                torn_bytes = path.stat().st_size - self._read_offset(path)
+                if torn_bytes > 0:
+                    logger.warning("Ignored %d torn bytes at the end of %s", torn_bytes, path)
+                path.unlink()
+                self._offset_path(path).unlink(missing_ok=True)
+
+    def apply_all(self, path: Path) -> None:
+        """Apply every unapplied record of a journal"""
+        while self.apply_batch_from(path):
+            pass
+
+    def apply_batch_from(self, path: Path) -> int:
+        """Apply the next batch of records of a journal, returning how many"""
+        with self._apply_lock:
+            size = path.stat().st_size
+            offset = self._read_offset(path)
+            if offset > size:
+                offset = 0  # The journal was compacted after the offset was read
+            results, new_offset = read_results(path, offset, self.apply_batch)
+            if results:
+                self.apply(results)
+                self._write_offset(path, new_offset)
+                self.pending.difference_update(result.session_id for result in results)
+            elif path == self.path:
+                self._compact(offset)
+            return len(results)
+
+    async def _run_flusher(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.flush_interval)  # Let more results join the group
+            await self._flush()
+
+    async def _flush(self) -> None:
+        self._wakeup.clear()
+        data, waiters = bytes(self._buffer), self._waiters
+        self._buffer, self._waiters = bytearray(), []
+        if not data:
+            return
+        try:
+            await asyncio.to_thread(self._write, data)
+        except OSError as error:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(error)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _run_applier(self) -> None:
+        while True:
+            await asyncio.sleep(self.apply_interval)
+            try:
+                await asyncio.to_thread(self.apply_all, self.path)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to apply game result journal, will retry")
+
+    def _write(self, data: bytes) -> None:
+        with self._write_lock:
+            os.write(self._fd, data)
+            os.fsync(self._fd)
+
+    def _compact(self, offset: int) -> None:
+        """Empty the journal once everything in it is applied"""
+        if offset < self.compact_bytes:
+            return
+        with self._write_lock:
+            if os.fstat(self._fd).st_size == offset:
+                os.ftruncate(self._fd, 0)
+                os.fsync(self._fd)
+                self._write_offset(self.path, 0)
+
+    @staticmethod
+    def _offset_path(path: Path) -> Path:
+        return path.with_suffix(".applied")
+
+    def _read_offset(self, path: Path) -> int:
+        try:
+            return int(self._offset_path(path).read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_offset(self, path: Path, offset: int) -> None:
+        offset_path = self._offset_path(path)
+        temp_path = offset_path.with_suffix(".tmp")
+        with temp_path.open("w") as file:
+            file.write(str(offset))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, offset_path)
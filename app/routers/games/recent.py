@@ -0,0 +1,238 @@
+"""Recent game results module"""
+import uuid
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Tuple
+
+from app.models import GameStatus
+
+EPOCH = datetime(1970, 1, 1)
+MISSING = -1
+STATUSES = list(GameStatus)
+
+
+class RecentGame(NamedTuple):
+    """Game session kept in memory"""
+
+    id: uuid.UUID
+    start_time: datetime
+    stop_time: datetime | None
+    duration_ms: int | None
+    deviation_ms: int | None
+    status: GameStatus
+
+
+class UserTotals(NamedTuple):
+    """Running aggregates of every game of a user"""
+
+    total_games: int
+    completed_games: int
+    deviation_sum: int
+    best_deviation_ms: int | None
+    worst_deviation_ms: int | None
+
+
+def to_us(moment: datetime | None) -> int:
+    """Microseconds since the epoch, or MISSING"""
+    return MISSING if moment is None else (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def from_us(value: int) -> datetime | None:
+    """Datetime from microseconds since the epoch, or None when MISSING"""
+    return None if value == MISSING else EPOCH + timedelta(microseconds=value)
+
+
+class RecentResults:
+    """In-process ring buffers of the last games of each user, plus running totals.
+
+    Games are stored column by column in flat arrays, one block of per_user
+    rows for each user slot, so a user costs a few hundred bytes instead of a
+    list of ORM objects. Every user entry carries the version it reflects;
+    callers compare it with a shared version counter and reload stale users
+    from the database.
+    """
+
+    def __init__(self, per_user: int, max_users: int):
+        self.per_user = per_user
+        self.max_users = max_users
+        self.epoch = 0  # Shared generation of every user, bumped by offline recomputes
+        self._slots: OrderedDict[uuid.UUID, int] = OrderedDict()
+        self._free: List[int] = []
+        # One row per game
+        self._ids = bytearray()
+        self._start_us = array("q")
+        self._stop_us = array("q")
+        self._duration_ms = array("q")
+        self._deviation_ms = array("q")
+        self._status = array("b")
+        # One row per user slot
+        self._version = array("q")
+        self._head = array("l")
+        self._size = array("l")
+        self._total = array("q")
+        self._completed = array("q")
+        self._deviation_sum = array("q")
+        self._best = array("q")
+        self._worst = array("q")
+
+    def load(
+        self, user_id: uuid.UUID, version: int, totals: UserTotals, games: List[RecentGame]
+    ) -> None:
+        """Store the totals and the last games (newest first) of a user read from the database"""
+        if self.max_users <= 0:
+            return
+        slot = self._slots.pop(user_id, None)
+        if slot is None:
+            slot = self._allocate()
+        self._slots[user_id] = slot
+        self._version[slot] = version
+        self._head[slot] = self._size[slot] = 0
+        self._total[slot] = totals.total_games
+        self._completed[slot] = totals.completed_games
+        self._deviation_sum[slot] = totals.deviation_sum
+        self._best[slot] = MISSING if totals.best_deviation_ms is None else totals.best_deviation_ms
+        self._worst[slot] = (
+            MISSING if totals.worst_deviation_ms is None else totals.worst_deviation_ms
+        )
+        for game in reversed(games[: self.per_user]):
+            self._push(slot, game)
+
+    def get(
+        self, user_id: uuid.UUID, version: int
+    ) -> Tuple[UserTotals, List[RecentGame]] | None:
+        """Get the totals and the last games (newest first) of a user, if up to date"""
+        slot = self._slots.get(user_id)
+        if slot is None or self._version[slot] != version:
+            return None
+        self._slots.move_to_end(user_id)
+        completed = self._completed[slot]
+        totals = UserTotals(
+            total_games=self._total[slot],
+            completed_games=completed,
+            deviation_sum=self._deviation_sum[slot],
+            best_deviation_ms=self._best[slot] if completed else None,
+            worst_deviation_ms=self._worst[slot] if completed else None,
+        )
+        games = [self._read(row) for row in self._rows(slot)]
+        return totals, games
+
+    def record(
+        self,
+        user_id: uuid.UUID,
+        version: int,
+        game_id: uuid.UUID,
+        status: GameStatus,
+        start_time: datetime | None = None,
+        stop_time: datetime | None = None,
+        duration_ms: int | None = None,
+        deviation_ms: int | None = None,
+    ) -> None:
+        """Apply a change bumping a user's version, or forget the user if a change was missed"""
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return
+        if self._version[slot] != version - 1:
+            self.discard(user_id)
+            return
+        self._version[slot] = version
+
+        row = self._find(slot, game_id)
+        if row is None:
+            if status != GameStatus.STARTED or start_time is None:
+                self.discard(user_id)  # A game older than the ring changed
+                return
+            self._push(slot, RecentGame(game_id, start_time, None, None, None, status))
+            self._total[slot] += 1
+            return
+
+        previous = STATUSES[self._status[row]]
+        self._status[row] = STATUSES.index(status)
+        if stop_time is not None:
+            self._stop_us[row] = to_us(stop_time)
+        if duration_ms is not None:
+            self._duration_ms[row] = duration_ms
+        if deviation_ms is not None:
+            self._deviation_ms[row] = deviation_ms
+        if status == GameStatus.COMPLETED and previous != GameStatus.COMPLETED:
+            deviation = self._deviation_ms[row]
+            first = self._completed[slot] == 0
+            self._completed[slot] += 1
+            self._deviation_sum[slot] += deviation
+            self._best[slot] = deviation if first else min(self._best[slot], deviation)
+            self._worst[slot] = deviation if first else max(self._worst[slot], deviation)
+
+    def discard(self, user_id: uuid.UUID) -> None:
+        """Forget a user"""
+        slot = self._slots.pop(user_id, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def clear(self, epoch: int) -> None:
+        """Forget every user, keeping the allocated slots for reuse"""
+        self._free.extend(self._slots.values())
+        self._slots.clear()
+        self.epoch = epoch
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if len(self._slots) >= self.max_users:
+            _, slot = self._slots.popitem(last=False)  # Least recently used
+            return slot
+        slot = len(self._version)
+        self._ids.extend(bytes(16 * self.per_user))
+        for column in (self._start_us, self._stop_us, self._duration_ms, self._deviation_ms):
+            column.extend([MISSING] * self.per_user)
+        self._status.extend([0] * self.per_user)
+        for column in (
+            self._version,
+            self._head,
+            self._size,
+            self._total,
+            self._completed,
+            self._deviation_sum,
+            self._best,
+            self._worst,
+        ):
+            column.append(0)
+        return slot
+
+    def _rows(self, slot: int) -> List[int]:
+        """Rows of a slot, newest first"""
+        base, head = slot * self.per_user, self._head[slot]
+        return [base + (head - 1 - age) % self.per_user for age in range(self._size[slot])]
+
+    def _find(self, slot: int, game_id: uuid.UUID) -> int | None:
+        key = game_id.bytes
+        return next(
+            (row for row in self._rows(slot) if self._ids[16 * row : 16 * row + 16] == key), None
+        )
+
+    def _push(self, slot: int, game: RecentGame) -> None:
+        row = slot * self.per_user + self._head[slot]
+        self._ids[16 * row : 16 * row + 16] = game.id.bytes
+        self._start_us[row] = to_us(game.start_time)
+        self._stop_us[row] = to_us(game.stop_time)
+        self._duration_ms[row] = MISSING if game.duration_ms is None else game.duration_ms
+        self._deviation_ms[row] = MISSING if game.deviation_ms is None else game.deviation_ms
+        self._status[row] = STATUSES.index(game.status)
+        self._head[slot] = (self._head[slot] + 1) % self.per_user
+        self._size[slot] = min(self._size[slot] + 1, self.per_user)
+
+    def _game_id(self, row: int) -> uuid.UUID:
+        return uuid.UUID(bytes=bytes(self._ids[16 * row : 16 * row + 16]))
+
+    def _read(self, row: int) -> RecentGame:
+        duration_ms, deviation_ms = self._duration_ms[row], self._deviation_ms[row]
+        return RecentGame(
+            id=self._game_id(row),
+            start_time=from_us(self._start_us[row]),
+            stop_time=from_us(self._stop_us[row]),
+            duration_ms=None if duration_ms == MISSING else duration_ms,
+            deviation_ms=None if deviation_ms == MISSING else deviation_ms,
+            status=STATUSES[self._status[row]],
+        )
+
+    def __len__(self) -> int:
+        return len(self._slots)
@@ -1,27 +1,105 @@
 """Repository Layer"""
+import heapq
 import uuid
-from typing import List
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+from typing import Dict, List, Tuple
 
-from sqlmodel import select
+from sqlalchemy import and_, inspect, or_, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, func, select
 
+from app.core.counters import (
+    DEVIATION_SUM,
+    GAME_COUNTERS,
+    GAMES_PLAYED,
+    counter_db,
+    is_seeded,
+    seed_counters,
+    stage_counters,
+)
 from app.core.repository import AbstractRepositoryHasUser
+from app.core.shards import ShardSet, get_shards
 from app.models import GameSession, GameStatus
+from app.routers.games.journal import GameResult
+from app.routers.games.recent import UserTotals
+
+# user_id, total_games, avg_deviation, best_deviation
+# Players are ranked by average deviation, ties broken by user_id
+RankedPlayer = Tuple[uuid.UUID, int, float, int]
+
+
+def completed_totals(db_session) -> Tuple[int, int]:
+    """Count the completed game sessions of one database and sum their deviations"""
+    games, deviation_sum = db_session.exec(
+        select(func.count(GameSession.id), func.sum(GameSession.deviation_ms)).where(
+            GameSession.status == GameStatus.COMPLETED
+        )
+    ).one()
+    return games, deviation_sum or 0
+
+
+def count_completed(db_session, deviations: List[int]) -> None:
+    """Add completed games to the game counters of a database, in its current transaction"""
+    stage_counters(db_session, {GAMES_PLAYED: len(deviations), DEVIATION_SUM: sum(deviations)})
+
+
+def newly_completed(game_session: GameSession) -> bool:
+    """Check if a game session was marked completed since it was loaded"""
+    if game_session.status != GameStatus.COMPLETED:
+        return False
+    previous = inspect(game_session).attrs.status.history.deleted
+    return bool(previous) and previous[0] != GameStatus.COMPLETED
+
+
+def ranked_player_query(user_id: uuid.UUID):
+    """Leaderboard row of a player, none without completed games"""
+    return (
+        select(
+            GameSession.user_id,
+            func.count(GameSession.id),
+            func.avg(GameSession.deviation_ms),
+            func.min(GameSession.deviation_ms),
+        )
+        .where(GameSession.user_id == user_id, GameSession.status == GameStatus.COMPLETED)
+        .group_by(GameSession.user_id)
+    )
+
+
+def players_ahead_query(user_id: uuid.UUID, avg_deviation: float):
+    """Count the players ranked before a player"""
+    player_avg = func.avg(GameSession.deviation_ms)
+    ahead = (
+        select(GameSession.user_id)
+        .where(GameSession.status == GameStatus.COMPLETED)
+        .group_by(GameSession.user_id)
+        .having(
+            or_(
+                player_avg < avg_deviation,
+                and_(player_avg == avg_deviation, GameSession.user_id < user_id),
+            )
+        )
+    )
+    return select(func.count()).select_from(ahead.subquery())
 
 
 class GameRepository(AbstractRepositoryHasUser):
     """Game Session Repository"""
 
     def get_by_user_id(self, user_id: uuid.UUID, db_session) -> GameSession | None:
-        """Get ACTIVE game session by user_id"""
+        """Get the latest ACTIVE game session by user_id"""
         active_session = db_session.exec(
-            select(GameSession).where(
-                GameSession.user_id == user_id, GameSession.status == GameStatus.STARTED
-            )
+            select(GameSession)
+            .where(GameSession.user_id == user_id, GameSession.status == GameStatus.STARTED)
+            .order_by(GameSession.start_time.desc())
         ).first()
         return active_session
 
-    def get(self, item_id: uuid.UUID, db_session) -> GameSession | None:
-        """Get an ACTIVE game session by ID"""
+    def get(
+        self, item_id: uuid.UUID, db_session, user_id: uuid.UUID | None = None
+    ) -> GameSession | None:
+        """Get an ACTIVE game session by ID, user_id is an optional routing hint"""
         active_session = db_session.exec(
             select(GameSession).where(
                 GameSession.id == item_id, GameSession.status == GameStatus.STARTED
@@ -29,6 +107,17 @@ class GameRepository(AbstractRepositoryHasUser):
         ).first()
         return active_session
 
+    def get_many(
+        self, item_ids: List[uuid.UUID], db_session, user_id: uuid.UUID | None = None
+    ) -> List[GameSession]:
+        """Get ACTIVE game sessions by IDs, user_id is an optional routing hint"""
+        active_sessions = db_session.exec(
+            select(GameSession).where(
+                GameSession.id.in_(item_ids), GameSession.status == GameStatus.STARTED
+            )
+        ).all()
+        return list(active_sessions)
+
     def create(self, item: GameSession, db_session) -> GameSession:
         """Create a game session"""
         db_session.add(item)
@@ -46,5 +135,381 @@ class GameRepository(AbstractRepositoryHasUser):
         db_session.refresh(updated_item)
         return updated_item
 
+    def update_many(self, updated_items: List[GameSession], db_session) -> List[GameSession]:
+        """UPDATE several game sessions in a single transaction, counting the completed ones"""
+        count_completed(
+            db_session, [item.deviation_ms for item in updated_items if newly_completed(item)]
+        )
+        db_session.add_all(updated_items)
+        db_session.commit()
+        return updated_items
+
+    def complete(
+        self,
+        item_id: uuid.UUID,
+        stop_time: datetime,
+        duration_ms: int,
+        deviation_ms: int,
+        db_session,
+        user_id: uuid.UUID | None = None,
+    ) -> bool:
+        """Complete an ACTIVE game session without reading it first"""
+        result = db_session.exec(
+            update(GameSession)
+            .where(GameSession.id == item_id, GameSession.status == GameStatus.STARTED)
+            .values(
+                stop_time=stop_time,
+                duration_ms=duration_ms,
+                deviation_ms=deviation_ms,
+                status=GameStatus.COMPLETED,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        if result.rowcount:
+            count_completed(db_session, [deviation_ms])
+        db_session.commit()
+        return result.rowcount > 0
+
+    def complete_many(self, results: List[GameResult], db_session) -> List[GameResult]:
+        """Complete ACTIVE game sessions in a single transaction, returning the applied ones"""
+        applied = []
+        for result in results:
+            statement = (
+                update(GameSession)
+                .where(
+                    GameSession.id == result.session_id,
+                    GameSession.status == GameStatus.STARTED,
+                )
+                .values(
+                    stop_time=result.stop_time,
+                    duration_ms=result.duration_ms,
+                    deviation_ms=result.deviation_ms,
+                    status=GameStatus.COMPLETED,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            if db_session.exec(statement).rowcount:
+                applied.append(result)
+        count_completed(db_session, [result.deviation_ms for result in applied])
+        db_session.commit()
+        return applied
+
+    def set_status(
+        self,
+        item_id: uuid.UUID,
+        status: GameStatus,
+        db_session,
+        user_id: uuid.UUID | None = None,
+    ) -> bool:
+        """Change the status of an ACTIVE game session without reading it first"""
+        result = db_session.exec(
+            update(GameSession)
+            .where(GameSession.id == item_id, GameSession.status == GameStatus.STARTED)
+            .values(status=status, updated_at=datetime.utcnow())
+        )
+        db_session.commit()
+        return result.rowcount > 0
+
+    def get_all_by_user_id(self, user_id: uuid.UUID, db_session) -> List[GameSession]:
+        """Get every game session of a user, newest first"""
+        game_sessions = db_session.exec(
+            select(GameSession)
+            .where(GameSession.user_id == user_id)
+            .order_by(GameSession.created_at.desc())
+        ).all()
+        return list(game_sessions)
+
+    def get_recent_by_user_id(
+        self, user_id: uuid.UUID, limit: int, db_session
+    ) -> List[GameSession]:
+        """Get the last game sessions of a user, newest first"""
+        game_sessions = db_session.exec(
+            select(GameSession)
+            .where(GameSession.user_id == user_id)
+            .order_by(GameSession.created_at.desc())
+            .limit(limit)
+        ).all()
+        return list(game_sessions)
+
+    def get_totals_by_user_id(self, user_id: uuid.UUID, db_session) -> UserTotals:
+        """Count the game sessions of a user and aggregate the deviation of completed ones"""
+        completed = GameSession.status == GameStatus.COMPLETED
+        total_games, completed_games, deviation_sum, best, worst = db_session.exec(
+            select(
+                func.count(GameSession.id),
+                func.count(GameSession.id).filter(completed),
+                func.sum(GameSession.deviation_ms).filter(completed),
+                func.min(GameSession.deviation_ms).filter(completed),
+                func.max(GameSession.deviation_ms).filter(completed),
+            ).where(GameSession.user_id == user_id)
+        ).one()
+        return UserTotals(total_games, completed_games, deviation_sum or 0, best, worst)
+
+    def get_active_since(self, since: datetime, db_session) -> List[GameSession]:
+        """Get the ACTIVE game sessions started after a moment"""
+        active_sessions = db_session.exec(
+            select(GameSession).where(
+                GameSession.status == GameStatus.STARTED, GameSession.start_time > since
+            )
+        ).all()
+        return list(active_sessions)
+
+    def get_completed_totals(self, db_session) -> Tuple[int, int]:
+        """Count completed game sessions and sum their deviations"""
+        return completed_totals(db_session)
+
+    def get_counters(self, db_session) -> Dict[str, int]:
+        """Get the game counters, missing ones as 0"""
+        values = counter_db.get_values(db_session=db_session)
+        return {name: values.get(name, 0) for name in GAME_COUNTERS}
+
+    def seed_counters(self, db_session) -> bool:
+        """Create the game counters from full aggregates, unless they exist"""
+        if is_seeded(db_session, GAME_COUNTERS):
+            return False
+        games, deviation_sum = completed_totals(db_session)
+        return seed_counters(db_session, {GAMES_PLAYED: games, DEVIATION_SUM: deviation_sum})
+
+    def reset_counters(self, db_session) -> None:
+        """Overwrite the game counters with full aggregates"""
+        games, deviation_sum = completed_totals(db_session)
+        counter_db.set_values({GAMES_PLAYED: games, DEVIATION_SUM: deviation_sum}, db_session)
+
+    def get_ranked_players(
+        self, offset: int, limit: int | None, db_session
+    ) -> Tuple[int, List[RankedPlayer]]:
+        """Count players with completed games and get a page of them, best first"""
+        subquery = (
+            select(
+                GameSession.user_id,
+                func.count(GameSession.id).label("total_games"),
+                func.avg(GameSession.deviation_ms).label("avg_deviation"),
+                func.min(GameSession.deviation_ms).label("best_deviation"),
+            )
+            .where(GameSession.status == GameStatus.COMPLETED)
+            .group_by(GameSession.user_id)
+            .subquery()
+        )
+        total_players = db_session.exec(select(func.count()).select_from(subquery)).first()
+        query = (
+            select(
+                subquery.c.user_id,
+                subquery.c.total_games,
+                subquery.c.avg_deviation,
+                subquery.c.best_deviation,
+            )
+            .order_by(subquery.c.avg_deviation, subquery.c.user_id)
+            .offset(offset)
+            .limit(limit)
+        )
+        return total_players or 0, [tuple(row) for row in db_session.exec(query).all()]
+
+    def get_player_rank(
+        self, user_id: uuid.UUID, db_session
+    ) -> Tuple[int, RankedPlayer] | None:
+        """Get the rank and leaderboard row of a player, without listing the others"""
+        player = db_session.exec(ranked_player_query(user_id)).first()
+        if player is None:
+            return None
+        ahead = db_session.exec(players_ahead_query(user_id, player[2])).one()
+        return ahead + 1, tuple(player)
+
     def delete(self, item: GameSession, db_session) -> GameSession:
         pass
+
+
+class ShardedGameRepository(GameRepository):
+    """Game Session Repository spread over several SQLite files by user_id.
+
+    The db_session argument is ignored: every call opens short sessions on the
+    shards it needs. Lookups without a user_id hint scatter over all shards.
+    """
+
+    @property
+    def shards(self) -> ShardSet:
+        """Configured shards, opened on first use"""
+        return get_shards()
+
+    def get_by_user_id(self, user_id: uuid.UUID, db_session) -> GameSession | None:
+        with self._session(self.shards.engine_for(user_id)) as shard_session:
+            return super().get_by_user_id(user_id, shard_session)
+
+    def get(
+        self, item_id: uuid.UUID, db_session, user_id: uuid.UUID | None = None
+    ) -> GameSession | None:
+        for engine in self._engines(user_id):
+            with self._session(engine) as shard_session:
+                game_session = super().get(item_id, shard_session)
+            if game_session:
+                return game_session
+        return None
+
+    def get_many(
+        self, item_ids: List[uuid.UUID], db_session, user_id: uuid.UUID | None = None
+    ) -> List[GameSession]:
+        game_sessions = []
+        for engine in self._engines(user_id):
+            with self._session(engine) as shard_session:
+                game_sessions.extend(super().get_many(item_ids, shard_session))
+        return game_sessions
+
+    def create(self, item: GameSession, db_session) -> GameSession:
+        with self._session(self.shards.engine_for(item.user_id)) as shard_session:
+            return super().create(item, shard_session)
+
+    def update(self, updated_item: GameSession, db_session) -> GameSession:
+        with self._session(self.shards.engine_for(updated_item.user_id)) as shard_session:
+            return super().update(updated_item, shard_session)
+
+    def update_many(self, updated_items: List[GameSession], db_session) -> List[GameSession]:
+        by_engine = defaultdict(list)
+        for item in updated_items:
+            by_engine[self.shards.engine_for(item.user_id)].append(item)
+        for engine, items in by_engine.items():
+            with self._session(engine) as shard_session:
+                super().update_many(items, shard_session)
+        return updated_items
+
+    def complete(
+        self,
+        item_id: uuid.UUID,
+        stop_time: datetime,
+        duration_ms: int,
+        deviation_ms: int,
+        db_session,
+        user_id: uuid.UUID | None = None,
+    ) -> bool:
+        for engine in self._engines(user_id):
+            with self._session(engine) as shard_session:
+                if super().complete(
+                    item_id, stop_time, duration_ms, deviation_ms, shard_session
+                ):
+                    return True
+        return False
+
+    def set_status(
+        self,
+        item_id: uuid.UUID,
+        status: GameStatus,
+        db_session,
+        user_id: uuid.UUID | None = None,
+    ) -> bool:
+        for engine in self._engines(user_id):
+            with self._session(engine) as shard_session:
+                if super().set_status(item_id, status, shard_session):
+                    return True
+        return False
+
+    def complete_many(self, results: List[GameResult], db_session) -> List[GameResult]:
+        by_engine = defaultdict(list)
+        for result in results:
+            by_engine[self.shards.engine_for(result.user_id)].append(result)
+        applied = []
+        for engine, shard_results in by_engine.items():
+            with self._session(engine) as shard_session:
+                applied.extend(super().complete_many(shard_results, shard_session))
+        return applied
+
+    def get_all_by_user_id(self, user_id: uuid.UUID, db_session) -> List[GameSession]:
+        with self._session(self.shards.engine_for(user_id)) as shard_session:
+            return super().get_all_by_user_id(user_id, shard_session)
+
+    def get_recent_by_user_id(
+        self, user_id: uuid.UUID, limit: int, db_session
+    ) -> List[GameSession]:
+        with self._session(self.shards.engine_for(user_id)) as shard_session:
+            return super().get_recent_by_user_id(user_id, limit, shard_session)
+
+    def get_totals_by_user_id(self, user_id: uuid.UUID, db_session) -> UserTotals:
+        with self._session(self.shards.engine_for(user_id)) as shard_session:
+            return super().get_totals_by_user_id(user_id, shard_session)
+
+    def get_active_since(self, since: datetime, db_session) -> List[GameSession]:
+        active_sessions = []
+        for engine in self.shards.engines:
+            with self._session(engine) as shard_session:
+                active_sessions.extend(super().get_active_since(since, shard_session))
+        return active_sessions
+
+    def get_completed_totals(self, db_session) -> Tuple[int, int]:
+        games = deviation_sum = 0
+        for engine in self.shards.engines:
+            with self._session(engine) as shard_session:
+                shard_games, shard_deviation_sum = super().get_completed_totals(shard_session)
+            games += shard_games
+            deviation_sum += shard_deviation_sum
+        return games, deviation_sum
+
+    def get_counters(self, db_session) -> Dict[str, int]:
+        # Each shard counts its own games, so completing one never writes the main database
+        totals = dict.fromkeys(GAME_COUNTERS, 0)
+        for engine in self.shards.engines:
+            with self._session(engine) as shard_session:
+                for name, value in super().get_counters(shard_session).items():
+                    totals[name] += value
+        return totals
+
+    def seed_counters(self, db_session) -> bool:
+        seeded = False
+        for engine in self.shards.engines:
+            with self._session(engine) as shard_session:
+                seeded = super().seed_counters(shard_session) or seeded
+        return seeded
+
+    def reset_counters(self, db_session) -> None:
+        for engine in self.shards.engines:
+            with self._session(engine) as shard_session:
+                super().reset_counters(shard_session)
+
+    def get_ranked_players(
+        self, offset: int, limit: int | None, db_session
+    ) -> Tuple[int, List[RankedPlayer]]:
+        # A user's games all live in one shard, so per-shard groups are complete.
+        # Each shard returns its best offset + limit players, merged by rank.
+        avg_deviation = func.avg(GameSession.deviation_ms).label("avg_deviation")
+        grouped = (
+            select(
+                GameSession.user_id,
+                func.count(GameSession.id),
+                avg_deviation,
+                func.min(GameSession.deviation_ms),
+            )
+            .where(GameSession.status == GameStatus.COMPLETED)
+            .group_by(GameSession.user_id)
+        )
+        count_query = select(func.count()).select_from(grouped.subquery())
+        page_query = grouped.order_by(avg_deviation, GameSession.user_id)
+        if limit is not None:
+            page_query = page_query.limit(offset + limit)
+
+        total_players = 0
+        shard_pages = []
+        for engine in self.shards.engines:
+            with self._session(engine) as shard_session:
+                total_players += shard_session.exec(count_query).one()
+                shard_pages.append([tuple(row) for row in shard_session.exec(page_query)])
+        players = heapq.merge(*shard_pages, key=lambda player: (player[2], player[0]))
+        stop = None if limit is None else offset + limit
+        return total_players, list(islice(players, offset, stop))
+
+    def get_player_rank(
+        self, user_id: uuid.UUID, db_session
+    ) -> Tuple[int, RankedPlayer] | None:
+        with self._session(self.shards.engine_for(user_id)) as shard_session:
+            player = shard_session.exec(ranked_player_query(user_id)).first()
+        if player is None:
+            return None
+        ahead = 0
+        for engine in self.shards.engines:
+            with self._session(engine) as shard_session:
+                ahead += shard_session.exec(players_ahead_query(user_id, player[2])).one()
+        return ahead + 1, tuple(player)
+
+    def _engines(self, user_id: uuid.UUID | None) -> List[Engine]:
+        if user_id is None:
+            return self.shards.engines
+        return [self.shards.engine_for(user_id)]
+
+    @staticmethod
+    def _session(engine: Engine) -> Session:
+        return Session(engine, expire_on_commit=False)
@@ -1,34 +1,143 @@
 """Games service module"""
+import logging
 import uuid
 from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
 
 from sqlmodel import Session
 
+from app.core.cache import get_cache
 from app.core.config import settings
+from app.core.database import engine
+from app.core.profiler import span
 from app.models import GameSession, GameStatus, User
-from app.routers.games.repository import GameRepository
+from app.routers.games.journal import GameResult, ResultJournal
+from app.routers.games.recent import RecentGame, RecentResults, UserTotals
+from app.routers.games.repository import GameRepository, RankedPlayer, ShardedGameRepository
+from app.routers.games.timing import SessionTimer, SessionTiming
+from app.schemas import GameStopResponse
 
-game_db = GameRepository()
+logger = logging.getLogger(__name__)
+
+RECENT_GAMES = 10
+
+game_db = ShardedGameRepository() if settings.GAME_SHARDS else GameRepository()
+session_timer = SessionTimer(max_age_ns=settings.GAME_SESSION_EXPIRE_MINUTES * 60 * 1_000_000_000)
+recent_results = RecentResults(per_user=RECENT_GAMES, max_users=settings.RECENT_RESULTS_MAX_USERS)
+result_journal = (
+    ResultJournal(
+        directory=settings.JOURNAL_DIR,
+        apply=lambda results: apply_game_results(results),
+        flush_interval_ms=settings.JOURNAL_FLUSH_INTERVAL_MS,
+        apply_interval_ms=settings.JOURNAL_APPLY_INTERVAL_MS,
+        apply_batch=settings.JOURNAL_APPLY_BATCH,
+        compact_bytes=settings.JOURNAL_COMPACT_BYTES,
+    )
+    if settings.JOURNAL_ENABLED
+    else None
+)
 
 
 async def get_session_by_user(db_session: Session, user: User) -> GameSession | None:
     """Check if a game session exists for a user."""
     active_session = game_db.get_by_user_id(user_id=user.id, db_session=db_session)
+    if active_session and is_result_pending(active_session.id):
+        return None  # Stopped, the journal has not saved it yet
     return active_session
 
 
-async def get_session_by_id(db_session: Session, game_id: uuid.UUID) -> GameSession | None:
+async def get_session_by_id(
+    db_session: Session, game_id: uuid.UUID, user_id: uuid.UUID | None = None
+) -> GameSession | None:
     """Check if a game session exists by ID."""
-    active_session = game_db.get(item_id=game_id, db_session=db_session)
+    with span("games.load_session"):
+        active_session = game_db.get(item_id=game_id, db_session=db_session, user_id=user_id)
     return active_session
 
 
+async def get_sessions_by_ids(
+    db_session: Session, game_ids: List[uuid.UUID], user_id: uuid.UUID | None = None
+) -> Dict[uuid.UUID, GameSession]:
+    """Get active game sessions by ID, keyed by ID."""
+    active_sessions = game_db.get_many(item_ids=game_ids, db_session=db_session, user_id=user_id)
+    return {game_session.id: game_session for game_session in active_sessions}
+
+
+def get_sessions_for_user(db_session: Session, user_id: uuid.UUID) -> List[GameSession]:
+    """Get every game session of a user, newest first."""
+    return game_db.get_all_by_user_id(user_id=user_id, db_session=db_session)
+
+
+def get_recent_results(
+    db_session: Session, user_id: uuid.UUID
+) -> Tuple[UserTotals, List[RecentGame]]:
+    """Get the totals and the last games of a user, from memory when up to date."""
+    in_memory = recent_results_enabled()
+    if in_memory:
+        sync_recent_results()
+        version = get_cache().get_generation(f"recent:{user_id}")
+        recent = recent_results.get(user_id, version)
+        if recent is not None:
+            return recent
+
+    with span("games.load_recent_results"):
+        totals = game_db.get_totals_by_user_id(user_id=user_id, db_session=db_session)
+        games = [
+            RecentGame(
+                gs.id, gs.start_time, gs.stop_time, gs.duration_ms, gs.deviation_ms, gs.status
+            )
+            for gs in game_db.get_recent_by_user_id(
+                user_id=user_id, limit=RECENT_GAMES, db_session=db_session
+            )
+        ]
+    if in_memory:
+        recent_results.load(user_id, version, totals, games)
+    return totals, games
+
+
+def track_game_session(
+    user_id: uuid.UUID, game_id: uuid.UUID, status: GameStatus, **changes
+) -> None:
+    """Invalidate the recent results of a user in every worker and update them in this one."""
+    if not recent_results_enabled():
+        return
+    sync_recent_results()
+    version = get_cache().bump_generation(f"recent:{user_id}")
+    recent_results.record(user_id, version, game_id, status, **changes)
+
+
+def recent_results_enabled() -> bool:
+    """Keep recent results in memory only when every worker sees the same versions."""
+    return settings.RECENT_RESULTS_MAX_USERS > 0 and get_cache().shared
+
+
+def sync_recent_results() -> None:
+    """Forget every user's recent results once statistics were recomputed offline."""
+    epoch = get_cache().get_generation("recent")
+    if epoch != recent_results.epoch:
+        recent_results.clear(epoch)
+
+
+def get_ranked_players(
+    db_session: Session, offset: int, limit: int | None
+) -> Tuple[int, List[RankedPlayer]]:
+    """Count ranked players and get a page of them (all with no limit), best first."""
+    return game_db.get_ranked_players(offset=offset, limit=limit, db_session=db_session)
+
+
+def get_player_rank(db_session: Session, user_id: uuid.UUID) -> Tuple[int, RankedPlayer] | None:
+    """Get the rank and leaderboard row of a player, if ranked."""
+    return game_db.get_player_rank(user_id=user_id, db_session=db_session)
+
+
 def update_game_session_status(
     db_session: Session, game_session: GameSession, status: GameStatus
 ) -> GameSession:
     """Update a game session status."""
     game_session.status = status
+    session_timer.discard(game_session.id)
     result = game_db.update(updated_item=game_session, db_session=db_session)
+    track_game_session(game_session.user_id, game_session.id, status)
     return result
 
 
@@ -38,12 +147,271 @@ def create_game_session(db_session: Session, game_session: GameSession) -> GameS
     return result
 
 
+def save_game_sessions(db_session: Session, game_sessions: List[GameSession]) -> None:
+    """Save several game sessions in one transaction."""
+    game_db.update_many(updated_items=game_sessions, db_session=db_session)
+    get_cache().bump_generation("leaderboard")
+    for game_session in game_sessions:
+        track_game_session(
+            game_session.user_id,
+            game_session.id,
+            game_session.status,
+            stop_time=game_session.stop_time,
+            duration_ms=game_session.duration_ms,
+            deviation_ms=game_session.deviation_ms,
+        )
+
+
+def start_game_session(user: User, db_session: Session) -> GameSession:
+    """Create a game session and start its monotonic timer."""
+    start_time, start_ns = datetime.utcnow(), session_timer.clock()
+    game_session = create_game_session(
+        game_session=GameSession(user_id=user.id, start_time=start_time, status=GameStatus.STARTED),
+        db_session=db_session,
+    )
+    session_timer.start(
+        session_id=game_session.id, user_id=user.id, start_time=start_time, start_ns=start_ns
+    )
+    track_game_session(user.id, game_session.id, GameStatus.STARTED, start_time=start_time)
+    return game_session
+
+
+def load_active_sessions(db_session: Session) -> int:
+    """Start the monotonic timers of the game sessions that can still be stopped."""
+    now, now_ns = datetime.utcnow(), session_timer.clock()
+    since = now - timedelta(minutes=settings.GAME_SESSION_EXPIRE_MINUTES)
+    active_sessions = [
+        game_session
+        for game_session in game_db.get_active_since(since=since, db_session=db_session)
+        if not is_result_pending(game_session.id)
+    ]
+    for game_session in active_sessions:
+        elapsed_us = (now - game_session.start_time) // timedelta(microseconds=1)
+        session_timer.start(
+            session_id=game_session.id,
+            user_id=game_session.user_id,
+            start_time=game_session.start_time,
+            start_ns=now_ns - elapsed_us * 1000,
+        )
+    return len(active_sessions)
+
+
+def get_game_counters(db_session: Session) -> Dict[str, int]:
+    """Get the games played and deviation sum counters, kept with the game sessions."""
+    return game_db.get_counters(db_session=db_session)
+
+
+def seed_game_counters(db_session: Session) -> bool:
+    """Create the game counters from full aggregates, unless another worker did."""
+    return game_db.seed_counters(db_session=db_session)
+
+
+def reset_game_counters(db_session: Session) -> None:
+    """Overwrite the game counters with full aggregates."""
+    game_db.reset_counters(db_session=db_session)
+
+
+def get_session_timing(game_id: uuid.UUID) -> SessionTiming | None:
+    """Get the in-process start stamps of a game session."""
+    return session_timer.get(game_id)
+
+
+def measure_game_session(timing: SessionTiming) -> tuple[datetime, int]:
+    """Measure a running game session, returning its stop time and duration in ms."""
+    elapsed_ns = session_timer.elapsed_ns(timing)
+    stop_time = timing.start_time + timedelta(microseconds=elapsed_ns // 1000)
+    return stop_time, calculate_duration_ms_from_ns(elapsed_ns)
+
+
+def build_stop_response(game_id: uuid.UUID, duration_ms: int) -> GameStopResponse:
+    """Score a game from its duration."""
+    with span("games.score"):
+        deviation_ms = calculate_deviation_ms(duration_ms)
+        return GameStopResponse(
+            session_id=game_id,
+            duration_ms=duration_ms,
+            deviation_ms=deviation_ms,
+            accuracy_percentage=calculate_accuracy_percentage(deviation_ms),
+            message=get_performance_message(deviation_ms),
+        )
+
+
+def complete_game_session(
+    game_session: GameSession, stop_time: datetime, duration_ms: int | None = None
+) -> GameStopResponse:
+    """Score a game session and mark it as completed, without saving it."""
+    if duration_ms is None:
+        duration_ms = calculate_duration_ms(game_session.start_time, stop_time)
+    result = build_stop_response(game_session.id, duration_ms)
+
+    game_session.stop_time = stop_time
+    game_session.duration_ms = result.duration_ms
+    game_session.deviation_ms = result.deviation_ms
+    game_session.status = GameStatus.COMPLETED
+    session_timer.discard(game_session.id)
+    return result
+
+
+def finish_game_session(
+    db_session: Session,
+    game_id: uuid.UUID,
+    stop_time: datetime,
+    result: GameStopResponse,
+    user_id: uuid.UUID | None = None,
+) -> bool:
+    """Save the result of an active game session without reading it first."""
+    session_timer.discard(game_id)
+    completed = game_db.complete(
+        item_id=game_id,
+        stop_time=stop_time,
+        duration_ms=result.duration_ms,
+        deviation_ms=result.deviation_ms,
+        db_session=db_session,
+        user_id=user_id,
+    )
+    if completed:
+        get_cache().bump_generation("leaderboard")
+    return completed
+
+
+async def record_game_result(
+    db_session: Session,
+    game_id: uuid.UUID,
+    user_id: uuid.UUID,
+    stop_time: datetime,
+    result: GameStopResponse,
+) -> bool:
+    """Save the result of an active game session, through the journal when enabled."""
+    with span("games.save_result"):
+        if result_journal is None:
+            saved = finish_game_session(
+                db_session=db_session,
+                game_id=game_id,
+                stop_time=stop_time,
+                result=result,
+                user_id=user_id,
+            )
+        elif not claim_game_result(game_id):
+            saved = False  # Already stopped through another worker
+        else:
+            session_timer.discard(game_id)
+            await result_journal.append(
+                GameResult(game_id, user_id, result.duration_ms, result.deviation_ms, stop_time)
+            )
+            saved = True
+    if saved:
+        track_game_session(
+            user_id,
+            game_id,
+            GameStatus.COMPLETED,
+            stop_time=stop_time,
+            duration_ms=result.duration_ms,
+            deviation_ms=result.deviation_ms,
+        )
+    return saved
+
+
+def result_claim_key(game_id: uuid.UUID) -> str:
+    """Cache key marking a game result as recorded by some worker"""
+    return f"result:{game_id}"
+
+
+def claim_game_result(game_id: uuid.UUID) -> bool:
+    """Claim the only journaled result of a game, across workers when the cache is shared."""
+    if result_journal is None:
+        return True
+    ttl_seconds = settings.GAME_SESSION_EXPIRE_MINUTES * 60
+    return get_cache().add(result_claim_key(game_id), True, ttl_seconds=ttl_seconds)
+
+
+def release_game_result(game_id: uuid.UUID) -> None:
+    """Drop the claim on a game result that was saved without the journal."""
+    if result_journal is not None:
+        get_cache().delete(result_claim_key(game_id))
+
+
+def is_result_pending(game_id: uuid.UUID) -> bool:
+    """Check if a game result is journaled but not yet saved to the database."""
+    if result_journal is None:
+        return False
+    if game_id in result_journal.pending:
+        return True
+    return get_cache().get(result_claim_key(game_id)) is not None
+
+
+def apply_game_results(results: List[GameResult]) -> None:
+    """Save journaled game results to the database."""
+    with Session(engine) as db_session:
+        applied = game_db.complete_many(results=results, db_session=db_session)
+    if applied:
+        get_cache().bump_generation("leaderboard")
+    if recent_results_enabled():
+        # Workers that reloaded a user before the result was applied missed it
+        for user_id in {result.user_id for result in applied}:
+            get_cache().bump_generation(f"recent:{user_id}")
+
+
+async def start_result_journal() -> None:
+    """Replay unapplied journaled results and start journaling, when enabled."""
+    if result_journal is not None:
+        if not get_cache().shared:
+            logger.warning(
+                "The result journal only prevents stopping a game twice within one worker "
+                "unless CACHE_BACKEND is shared"
+            )
+        await result_journal.start()
+
+
+async def stop_result_journal() -> None:
+    """Apply every journaled result and stop journaling, when enabled."""
+    if result_journal is not None:
+        await result_journal.stop()
+
+
+def expire_game_session(
+    db_session: Session, game_id: uuid.UUID, user_id: uuid.UUID | None = None
+) -> bool:
+    """Mark an active game session as expired without reading it first."""
+    session_timer.discard(game_id)
+    expired = game_db.set_status(
+        item_id=game_id, status=GameStatus.EXPIRED, db_session=db_session, user_id=user_id
+    )
+    if expired and user_id is not None:
+        track_game_session(user_id, game_id, GameStatus.EXPIRED)
+    return expired
+
+
+def get_stop_result(
+    user_id: uuid.UUID, game_id: uuid.UUID, idempotency_key: str
+) -> GameStopResponse | None:
+    """Get the stored result of a previous stop request."""
+    with span("games.idempotency_lookup"):
+        result = get_cache().get(f"game_stop:{user_id}:{game_id}:{idempotency_key}")
+    return GameStopResponse(**result) if result else None
+
+
+def save_stop_result(
+    user_id: uuid.UUID, idempotency_key: str, result: GameStopResponse
+) -> None:
+    """Store the result of a stop request for retries."""
+    get_cache().set(
+        f"game_stop:{user_id}:{result.session_id}:{idempotency_key}",
+        result.model_dump(mode="json"),
+        ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    )
+
+
 def calculate_duration_ms(start_time: datetime, stop_time: datetime) -> int:
     """Calculate duration in milliseconds"""
     duration = stop_time - start_time
     return int(duration.total_seconds() * 1000)
 
 
+def calculate_duration_ms_from_ns(elapsed_ns: int) -> int:
+    """Calculate duration in milliseconds from a monotonic interval, rounded to nearest"""
+    return (elapsed_ns + 500_000) // 1_000_000
+
+
 def calculate_deviation_ms(duration_ms: int) -> int:
     """Calculate absolute deviation from target time"""
     return abs(duration_ms - settings.TARGET_TIME_MS)
@@ -59,10 +427,10 @@ def calculate_accuracy_percentage(deviation_ms: int) -> float:
     return round(accuracy, 2)
 
 
-def is_session_expired(start_time: datetime) -> bool:
+def is_session_expired(start_time: datetime, now: datetime | None = None) -> bool:
     """Check if a game session has expired"""
     expiry_time = start_time + timedelta(minutes=settings.GAME_SESSION_EXPIRE_MINUTES)
-    return datetime.utcnow() > expiry_time
+    return (now or datetime.utcnow()) > expiry_time
 
 
 def get_performance_message(deviation_ms: int) -> str:
@@ -0,0 +1,62 @@
+"""Game session timing module"""
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple
+
+PRUNE_INTERVAL_NS = 60 * 1_000_000_000
+
+
+class SessionTiming(NamedTuple):
+    """Start stamps of a running game session"""
+
+    user_id: uuid.UUID
+    start_time: datetime
+    start_ns: int
+
+
+class SessionTimer:
+    """In-process table of monotonic start stamps keyed by game session ID.
+
+    Durations measured here are immune to wall clock adjustments. The table is
+    per process, so callers fall back to the persisted start_time on a miss
+    (e.g. after a restart or when another worker started the session).
+    """
+
+    def __init__(self, max_age_ns: int, clock: Callable[[], int] = time.monotonic_ns):
+        self.max_age_ns = max_age_ns
+        self.clock = clock
+        self._sessions: Dict[uuid.UUID, SessionTiming] = {}
+        self._next_prune_ns = clock() + PRUNE_INTERVAL_NS
+
+    def start(
+        self, session_id: uuid.UUID, user_id: uuid.UUID, start_time: datetime, start_ns: int
+    ) -> None:
+        """Record the start of a game session"""
+        self._sessions[session_id] = SessionTiming(user_id, start_time, start_ns)
+        if start_ns >= self._next_prune_ns:
+            self.prune(now_ns=start_ns)
+
+    def get(self, session_id: uuid.UUID) -> SessionTiming | None:
+        """Get the start stamps of a game session"""
+        return self._sessions.get(session_id)
+
+    def discard(self, session_id: uuid.UUID) -> None:
+        """Forget a game session"""
+        self._sessions.pop(session_id, None)
+
+    def elapsed_ns(self, timing: SessionTiming) -> int:
+        """Nanoseconds elapsed since a game session started"""
+        return self.clock() - timing.start_ns
+
+    def prune(self, now_ns: int | None = None) -> None:
+        """Forget game sessions that are too old to be stopped"""
+        now_ns = self.clock() if now_ns is None else now_ns
+        oldest_ns = now_ns - self.max_age_ns
+        stale = [key for key, timing in self._sessions.items() if timing.start_ns < oldest_ns]
+        for key in stale:
+            del self._sessions[key]
+        self._next_prune_ns = now_ns + PRUNE_INTERVAL_NS
+
+    def __len__(self) -> int:
+        return len(self._sessions)
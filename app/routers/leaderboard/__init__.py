@@ -0,0 +1,191 @@
+"""Leaderboard router module"""
+import asyncio
+import math
+import uuid
+from typing import Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel import Session
+
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.core.database import engine, get_session
+from app.core.profiler import span
+from app.core.dependencies import get_current_user
+from app.core.rate_limit import TokenBucketLimiter, rate_limit, token_user_id
+from app.models import User
+from app.routers.auth.service import user_db
+from app.routers.games.service import (
+    calculate_accuracy_percentage,
+    get_player_rank,
+    get_ranked_players,
+)
+from app.routers.leaderboard.snapshot import LeaderboardSnapshot, RankedEntry, get_snapshot
+from app.schemas import LeaderboardEntry, LeaderboardResponse
+
+DEFAULT_PER_PAGE = 10
+
+limiter = TokenBucketLimiter(
+    name="leaderboard",
+    per_minute=settings.RATE_LIMIT_LEADERBOARD_PER_MINUTE,
+    burst=settings.RATE_LIMIT_LEADERBOARD_BURST,
+)
+router = APIRouter(
+    prefix="/leaderboard",
+    tags=["Leaderboard"],
+    dependencies=[Depends(rate_limit(limiter, token_user_id))],
+)
+
+# Pages being built by this worker, keyed by cache key
+_building: Dict[str, asyncio.Future] = {}
+
+
+@router.get("", response_model=LeaderboardResponse)
+async def get_leaderboard(
+    page: int = Query(1, ge=1, description="Page number"),
+    per_page: int = Query(DEFAULT_PER_PAGE, ge=1, le=100, description="Items per page"),
+    current_user: User = Depends(get_current_user),
+):
+    """Get a page of the leaderboard, from the snapshot or cached until a game is completed."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        with span("leaderboard.snapshot_read"):
+            return snapshot_leaderboard(snapshot=snapshot, page=page, per_page=per_page)
+    return await get_leaderboard_page(page=page, per_page=per_page)
+
+
+@router.get("/rank/{user_id}", response_model=LeaderboardEntry)
+async def get_rank(
+    user_id: uuid.UUID,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Get the leaderboard entry of a player."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        entry = snapshot.find(user_id)
+    else:
+        entry = find_ranked_player(user_id=user_id, session=session)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Player not ranked")
+    return leaderboard_entry(entry)
+
+
+async def get_leaderboard_page(page: int, per_page: int) -> dict:
+    """Get a page of the leaderboard from the cache.
+
+    On a miss the page is built once, in a thread, however many requests
+    wait for it.
+    """
+    cache = get_cache()
+    with span("leaderboard.cache_lookup"):
+        cache_key = f"leaderboard:{cache.get_generation('leaderboard')}:{page}:{per_page}"
+        cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    building = _building.get(cache_key)
+    if building is None:
+        building = asyncio.ensure_future(
+            asyncio.to_thread(cache_leaderboard, page, per_page, cache_key)
+        )
+        _building[cache_key] = building
+        building.add_done_callback(lambda _: _building.pop(cache_key, None))
+    # A cancelled request must not cancel the build the others wait for
+    return await asyncio.shield(building)
+
+
+def cache_leaderboard(page: int, per_page: int, cache_key: str) -> dict:
+    """Build a page of the leaderboard and cache it"""
+    with Session(engine) as session, span("leaderboard.query"):
+        leaderboard = build_leaderboard(page=page, per_page=per_page, session=session)
+    leaderboard = leaderboard.model_dump(mode="json")
+    get_cache().set(cache_key, leaderboard, ttl_seconds=settings.LEADERBOARD_CACHE_TTL_SECONDS)
+    return leaderboard
+
+
+async def warm_leaderboard(pages: int) -> int:
+    """Cache the first pages of the leaderboard, unless it is served from the snapshot"""
+    if pages <= 0 or settings.LEADERBOARD_SNAPSHOT_ENABLED:
+        return 0
+    await asyncio.gather(
+        *(
+            get_leaderboard_page(page=page, per_page=DEFAULT_PER_PAGE)
+            for page in range(1, pages + 1)
+        )
+    )
+    return pages
+
+
+def snapshot_leaderboard(
+    snapshot: LeaderboardSnapshot, page: int, per_page: int
+) -> LeaderboardResponse:
+    """Build a page of the leaderboard from the snapshot"""
+    total_players = snapshot.total_players
+    entries = snapshot.entries(offset=(page - 1) * per_page, limit=per_page)
+    return LeaderboardResponse(
+        entries=[leaderboard_entry(entry) for entry in entries],
+        page=page,
+        total_pages=math.ceil(total_players / per_page) if total_players else 0,
+        total_players=total_players,
+    )
+
+
+def find_ranked_player(user_id: uuid.UUID, session: Session) -> RankedEntry | None:
+    """Find a player in the leaderboard from the database"""
+    ranked = get_player_rank(db_session=session, user_id=user_id)
+    if ranked is None:
+        return None
+    rank, (_, total_games, avg_deviation, best_deviation) = ranked
+    usernames = user_db.get_usernames([user_id], db_session=session)
+    return RankedEntry(
+        rank=rank,
+        user_id=user_id,
+        username=str(usernames.get(user_id)),
+        total_games=total_games,
+        average_deviation_ms=avg_deviation,
+        best_deviation_ms=best_deviation,
+    )
+
+
+def leaderboard_entry(entry: RankedEntry) -> LeaderboardEntry:
+    """Convert a ranked player to a leaderboard entry"""
+    return LeaderboardEntry(
+        rank=entry.rank,
+        username=entry.username,
+        total_games=entry.total_games,
+        average_deviation_ms=round(entry.average_deviation_ms, 2),
+        best_deviation_ms=entry.best_deviation_ms,
+        accuracy_percentage=calculate_accuracy_percentage(int(entry.average_deviation_ms)),
+    )
+
+
+def build_leaderboard(page: int, per_page: int, session: Session) -> LeaderboardResponse:
+    """Build a page of the leaderboard from the database"""
+    offset = (page - 1) * per_page
+    total_players, results = get_ranked_players(db_session=session, offset=offset, limit=per_page)
+    usernames = user_db.get_usernames([row[0] for row in results], db_session=session)
+
+    # Calculate pagination
+    total_pages = math.ceil(total_players / per_page) if total_players else 0
+
+    # Build leaderboard entries
+    entries = []
+    for idx, (user_id, total_games, avg_deviation, best_deviation) in enumerate(
+        results, start=offset + 1
+    ):
+        accuracy = calculate_accuracy_percentage(int(avg_deviation))
+        entries.append(
+            LeaderboardEntry(
+                rank=idx,
+                username=str(usernames.get(user_id)),
+                total_games=total_games,
+                average_deviation_ms=round(avg_deviation, 2),
+                best_deviation_ms=best_deviation,
+                accuracy_percentage=accuracy,
+            )
+        )
+
+    return LeaderboardResponse(
+        entries=entries, page=page, total_pages=total_pages, total_players=total_players
+    )
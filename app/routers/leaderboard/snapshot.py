@@ -0,0 +1,216 @@
+"""Leaderboard snapshot module.
+
+The full ranked leaderboard is periodically written to a binary file:
+
+    header | records, best first | usernames | index of records by user id
+
+Records have a fixed width, so a page or a rank is a slice of the file.
+Every worker maps the same file read-only and serves leaderboard reads from
+it without touching the database. The file is replaced atomically. Only
+the worker holding the builder lock rebuilds it.
+"""
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+import uuid
+from pathlib import Path
+from typing import Iterator, List, NamedTuple
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.routers.auth.service import user_db
+from app.routers.games.service import get_ranked_players
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LBSNAP01"
+HEADER = struct.Struct("<8sIdQQ")  # Magic, players, built at, usernames and index offsets
+RECORD = struct.Struct("<I16sIdqII")  # Rank, user id, games, average, best, username
+INDEX_ENTRY = struct.Struct("<16sI")  # User id, record position
+USERNAME_BATCH = 10_000
+
+
+class RankedEntry(NamedTuple):
+    """Ranked player with their username"""
+
+    rank: int
+    user_id: uuid.UUID
+    username: str
+    total_games: int
+    average_deviation_ms: float
+    best_deviation_ms: int
+
+
+def write_snapshot(path: Path, players: List[tuple], usernames: dict) -> None:
+    """Write ranked players and their usernames to a snapshot file, atomically"""
+    records = bytearray()
+    names = bytearray()
+    for rank, (user_id, total_games, avg_deviation, best_deviation) in enumerate(players, 1):
+        name = str(usernames.get(user_id)).encode()
+        records += RECORD.pack(
+            rank, user_id.bytes, total_games, avg_deviation, best_deviation, len(names), len(name)
+        )
+        names += name
+    index = b"".join(
+        INDEX_ENTRY.pack(user_id.bytes, position)
+        for user_id, position in sorted(
+            (player[0], position) for position, player in enumerate(players)
+        )
+    )
+    names_offset = HEADER.size + len(records)
+    index_offset = names_offset + len(names)
+
+    temp_path = path.with_suffix(".tmp")
+    with temp_path.open("wb") as file:
+        file.write(HEADER.pack(MAGIC, len(players), time.time(), names_offset, index_offset))
+        file.write(records)
+        file.write(names)
+        file.write(index)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def build_snapshot(path: Path) -> int:
+    """Write the current leaderboard to a snapshot file, returning the player count"""
+    with Session(engine) as db_session:
+        total_players, players = get_ranked_players(db_session=db_session, offset=0, limit=None)
+        usernames = {}
+        for start in range(0, total_players, USERNAME_BATCH):
+            batch = players[start : start + USERNAME_BATCH]
+            usernames.update(
+                user_db.get_usernames([player[0] for player in batch], db_session=db_session)
+            )
+    write_snapshot(path, players, usernames)
+    return total_players
+
+
+class LeaderboardSnapshot:
+    """Read-only view of the latest snapshot file, remapped when it is replaced"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._map: mmap.mmap | None = None
+        self._inode: int | None = None
+        self._count = 0
+        self._names_offset = 0
+        self._index_offset = 0
+
+    def refresh(self) -> bool:
+        """Map the latest snapshot, returning whether one is available"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return self._map is not None
+        if inode != self._inode:
+            with self.path.open("rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count, _, names_offset, index_offset = HEADER.unpack_from(mapped)
+            if magic != MAGIC:
+                mapped.close()
+                logger.warning("Ignoring %s, not a leaderboard snapshot", self.path)
+                return self._map is not None
+            self._map, self._inode = mapped, inode
+            self._count, self._names_offset, self._index_offset = count, names_offset, index_offset
+        return True
+
+    @property
+    def total_players(self) -> int:
+        """Number of ranked players"""
+        return self._count
+
+    def entries(self, offset: int, limit: int) -> Iterator[RankedEntry]:
+        """Ranked players from an offset, best first"""
+        start = HEADER.size + RECORD.size * min(offset, self._count)
+        stop = HEADER.size + RECORD.size * min(offset + limit, self._count)
+        for record in RECORD.iter_unpack(self._map[start:stop]):
+            yield self._entry(record)
+
+    def find(self, user_id: uuid.UUID) -> RankedEntry | None:
+        """Ranked player with a user id, or None when the player is not ranked"""
+        key = user_id.bytes
+        low, high = 0, self._count
+        while low < high:  # Binary search of the index, sorted by user id
+            middle = (low + high) // 2
+            entry_id, record_position = INDEX_ENTRY.unpack_from(
+                self._map, self._index_offset + INDEX_ENTRY.size * middle
+            )
+            if entry_id == key:
+                break
+            if entry_id < key:
+                low = middle + 1
+            else:
+                high = middle
+        else:
+            return None
+        return self._entry(
+            RECORD.unpack_from(self._map, HEADER.size + RECORD.size * record_position)
+        )
+
+    def _entry(self, record: tuple) -> RankedEntry:
+        rank, user_id, total_games, avg_deviation, best_deviation, name_offset, name_size = record
+        start = self._names_offset + name_offset
+        return RankedEntry(
+            rank=rank,
+            user_id=uuid.UUID(bytes=user_id),
+            username=self._map[start : start + name_size].decode(),
+            total_games=total_games,
+            average_deviation_ms=avg_deviation,
+            best_deviation_ms=best_deviation,
+        )
+
+
+snapshot = LeaderboardSnapshot(settings.LEADERBOARD_SNAPSHOT_PATH)
+
+
+def get_snapshot() -> LeaderboardSnapshot | None:
+    """Return the latest leaderboard snapshot, or None when disabled or not built yet"""
+    if settings.LEADERBOARD_SNAPSHOT_ENABLED and snapshot.refresh():
+        return snapshot
+    return None
+
+
+async def run_snapshot_builder(interval_seconds: float) -> None:
+    """Rebuild the snapshot periodically while this worker holds the builder lock"""
+    path = Path(settings.LEADERBOARD_SNAPSHOT_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.with_suffix(".lock").open("a") as lock:
+        while True:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                pass  # Another worker builds the snapshot
+            else:
+                try:
+                    if not path.exists() or time.time() - path.stat().st_mtime >= interval_seconds:
+                        await asyncio.to_thread(build_snapshot, path)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Failed to build the leaderboard snapshot, will retry")
+                finally:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            await asyncio.sleep(interval_seconds)
+
+
+_builder: asyncio.Task | None = None
+
+
+async def start_snapshot_builder() -> None:
+    """Start rebuilding the leaderboard snapshot, when enabled"""
+    global _builder  # pylint: disable=global-statement
+    if settings.LEADERBOARD_SNAPSHOT_ENABLED:
+        _builder = asyncio.create_task(
+            run_snapshot_builder(settings.LEADERBOARD_SNAPSHOT_INTERVAL_SECONDS)
+        )
+
+
+async def stop_snapshot_builder() -> None:
+    """Stop rebuilding the leaderboard snapshot"""
+    if _builder is not None:
+        _builder.cancel()
+        await asyncio.gather(_builder, return_exceptions=True)
@@ -0,0 +1,16 @@
+"""Metrics router module"""
+from fastapi import APIRouter
+
+from app.core.admission import admission_controller
+from app.core.rate_limit import limiters
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("")
+async def get_metrics():
+    """Runtime counters of this worker process."""
+    return {
+        "rate_limits": {limiter.name: limiter.stats() for limiter in limiters},
+        "admission": admission_controller.stats(),
+    }
@@ -28,6 +28,13 @@ class Token(BaseModel):
 
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+
+class RefreshRequest(BaseModel):
+    """Refresh token form"""
+
+    refresh_token: str
 
 
 class TokenData(BaseModel):
@@ -60,6 +67,33 @@ class GameStopResponse(BaseModel):
     message: str
 
 
+class GameStopBatchItem(BaseModel):
+    """Single game result submitted in a batch"""
+
+    session_id: uuid.UUID
+    idempotency_key: str | None = None
+
+
+class GameStopBatchRequest(BaseModel):
+    """Batch of game results"""
+
+    items: List[GameStopBatchItem]
+
+
+class GameStopBatchResult(BaseModel):
+    """Outcome of a single game result in a batch"""
+
+    session_id: uuid.UUID
+    result: GameStopResponse | None = None
+    error: str | None = None
+
+
+class GameStopBatchResponse(BaseModel):
+    """Response when a batch of games is stopped"""
+
+    results: List[GameStopBatchResult]
+
+
 class LeaderboardEntry(BaseModel):
     """Leaderboard entry model"""
 
@@ -92,6 +126,15 @@ class GameSessionResponse(BaseModel):
 
 
 # Analytics Schemas
+class DeviationPercentiles(BaseModel):
+    """Deviation percentiles of a player, as of the last statistics recompute"""
+
+    p50_deviation_ms: float
+    p90_deviation_ms: float
+    p99_deviation_ms: float
+    computed_at: datetime
+
+
 class UserStats(BaseModel):
     """User stats"""
 
@@ -104,3 +147,13 @@ class UserStats(BaseModel):
     worst_deviation_ms: int | None
     average_accuracy: float | None
     recent_games: List[GameSessionResponse]
+    deviation_percentiles: DeviationPercentiles | None = None
+
+
+class GlobalStats(BaseModel):
+    """Global stats"""
+
+    total_players: int
+    total_games: int
+    average_deviation_ms: float | None
+    average_accuracy: float | None
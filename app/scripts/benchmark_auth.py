@@ -0,0 +1,107 @@
+"""Token renewal CPU benchmark.
+
+Estimates the CPU time one player costs the server per hour of play, when
+access tokens are renewed by logging in again (before refresh tokens) and
+through /auth/refresh (after). Every ACCESS_TOKEN_EXPIRE_MINUTES the player
+renews their token, and between renewals they play games (a start and a
+stop each). Requests go through the whole app, in process, against a fresh
+SQLite database, and CPU is measured with process time.
+
+    python -m app.scripts.benchmark_auth --renewals 20 --games-per-hour 60
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from typing import Callable
+
+PASSWORD = "benchmark-password"
+
+
+def cpu_ms(action: Callable[[], None], repeat: int) -> float:
+    """Average CPU time of an action, in milliseconds"""
+    start = time.process_time()
+    for _ in range(repeat):
+        action()
+    return (time.process_time() - start) * 1000 / repeat
+
+
+def benchmark(renewals: int, games: int) -> dict:
+    """CPU time of a renewal by login and by refresh, and of a game, in milliseconds"""
+    # Settings are read on import, so the app is imported once the environment is set
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # One line per request otherwise
+    with TestClient(app) as client:
+        form = {"username": "benchmark", "email": "benchmark@example.com", "password": PASSWORD}
+        client.post("/auth/register", json=form).raise_for_status()
+        credentials = {"username": form["email"], "password": PASSWORD}
+        tokens = {}
+
+        def login():
+            response = client.post("/auth/login", data=credentials)
+            response.raise_for_status()
+            tokens.update(response.json())
+
+        def refresh():
+            response = client.post(
+                "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+            )
+            response.raise_for_status()
+            tokens.update(response.json())
+
+        def play():
+            headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+            response = client.post("/games/start", headers=headers)
+            response.raise_for_status()
+            session_id = response.json()["session_id"]
+            client.post(f"/games/{session_id}/stop", headers=headers).raise_for_status()
+
+        login()  # Warm up
+        return {
+            "login": cpu_ms(login, renewals),
+            "refresh": cpu_ms(refresh, renewals),
+            "game": cpu_ms(play, games),
+        }
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renewals", type=int, default=20, help="Renewals measured per mode")
+    parser.add_argument("--games", type=int, default=50, help="Games measured")
+    parser.add_argument("--games-per-hour", type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update(
+            DATABASE_URL=f"sqlite:///{directory}/benchmark.db",
+            CACHE_SQLITE_PATH=f"{directory}/cache.db",
+            GAME_SHARD_DIR=f"{directory}/shards",
+            JOURNAL_DIR=f"{directory}/journal",
+            LEADERBOARD_SNAPSHOT_PATH=f"{directory}/leaderboard.snapshot",
+            RATE_LIMIT_ENABLED="false",
+        )
+        from app.core.config import settings
+
+        costs = benchmark(args.renewals, args.games)
+        renewals_per_hour = 60 / settings.ACCESS_TOKEN_EXPIRE_MINUTES
+        play_ms = costs["game"] * args.games_per_hour
+        print(
+            f"BCRYPT_ROUNDS={settings.BCRYPT_ROUNDS}, {renewals_per_hour:.0f} renewals and "
+            f"{args.games_per_hour} games per hour, {costs['game']:.1f} ms CPU per game"
+        )
+        for mode in ("login", "refresh"):
+            hour_ms = costs[mode] * renewals_per_hour + play_ms
+            print(
+                f"{mode:8} {costs[mode]:8.1f} ms CPU per renewal  "
+                f"{hour_ms / 1000:7.2f} s CPU per player-hour",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Sharded storage write throughput benchmark.
+
+For each shard count K, creates K fresh SQLite files holding started game
+sessions, then completes them from several worker processes, one
+transaction per game as stop_game does, and prints completed games per
+second. Shards are created in a temporary directory unless --dir is given.
+
+    python -m app.scripts.benchmark_shards --max-shards 8 --workers 8 --games 20000
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app.core.shards import ShardSet
+from app.models import GameSession, GameStatus
+from app.routers.games.repository import GameRepository
+
+Game = Tuple[uuid.UUID, uuid.UUID]  # User id, game id
+
+
+def create_games(shards: ShardSet, games: int, users: int) -> List[Game]:
+    """Insert started game sessions spread over users, returning them"""
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    created = [(user_ids[index % users], uuid.uuid4()) for index in range(games)]
+    rows_by_engine = {}
+    now = datetime.utcnow()
+    for user_id, game_id in created:
+        rows_by_engine.setdefault(shards.engine_for(user_id), []).append(
+            {
+                "id": game_id,
+                "user_id": user_id,
+                "start_time": now,
+                "status": GameStatus.STARTED,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    for engine, rows in rows_by_engine.items():
+        with engine.begin() as connection:
+            connection.execute(insert(GameSession.__table__), rows)
+    return created
+
+
+def complete_games(shard_count: int, shard_dir: str, games: List[Game]) -> int:
+    """Complete game sessions one transaction at a time, in a worker process"""
+    shards = ShardSet(shard_count, shard_dir)
+    repository = GameRepository()
+    completed = 0
+    for user_id, game_id in games:
+        with Session(shards.engine_for(user_id)) as session:
+            completed += repository.complete(
+                item_id=game_id,
+                stop_time=datetime.utcnow(),
+                duration_ms=10_000,
+                deviation_ms=0,
+                db_session=session,
+            )
+    return completed
+
+
+def benchmark(shard_count: int, shard_dir: Path, workers: int, games: int, users: int) -> float:
+    """Completed games per second with a shard count"""
+    shard_dir.mkdir(parents=True)
+    created = create_games(ShardSet(shard_count, str(shard_dir)), games, users)
+    batches = [created[worker::workers] for worker in range(workers)]
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        pool.apply(time.sleep, (0,))  # Start the workers before timing
+        start = time.perf_counter()
+        jobs = [(shard_count, str(shard_dir), batch) for batch in batches]
+        completed = sum(pool.starmap(complete_games, jobs))
+        elapsed = time.perf_counter() - start
+    assert completed == games, f"{completed} of {games} games completed"
+    return games / elapsed
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-shards", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=8, help="Writing processes")
+    parser.add_argument("--games", type=int, default=20_000, help="Games completed per run")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--dir", help="Where to create the shards")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        baseline = None
+        for shard_count in range(1, args.max_shards + 1):
+            shard_dir = Path(directory) / f"k{shard_count}"
+            rate = benchmark(shard_count, shard_dir, args.workers, args.games, args.users)
+            baseline = baseline or rate
+            print(f"K={shard_count}  {rate:9.0f} games/s  x{rate / baseline:.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
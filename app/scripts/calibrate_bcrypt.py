@@ -0,0 +1,55 @@
+"""Bcrypt cost calibration command.
+
+Measures how long bcrypt hashing takes on this host for each cost and prints
+the highest BCRYPT_ROUNDS whose hashing time stays within a latency target.
+
+    python -m app.scripts.calibrate_bcrypt --target-ms 250
+"""
+import argparse
+import statistics
+import time
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
+def measure_hash_ms(rounds: int, samples: int) -> float:
+    """Median time in milliseconds to hash a password with the given cost"""
+    from passlib.hash import bcrypt
+
+    handler = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.hash("calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, min_rounds: int, samples: int) -> int:
+    """Highest cost whose hashing time is within the target, never below min_rounds"""
+    measure_hash_ms(MIN_ROUNDS, samples=1)  # Warm up the bcrypt backend
+    chosen = min_rounds
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        elapsed_ms = measure_hash_ms(rounds, samples)
+        print(f"rounds={rounds:2d}  {elapsed_ms:8.1f} ms")
+        if elapsed_ms > target_ms:
+            break
+        chosen = max(chosen, rounds)
+    return chosen
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=250, help="Hashing latency target")
+    parser.add_argument("--min-rounds", type=int, default=10, help="Lowest acceptable cost")
+    parser.add_argument("--samples", type=int, default=3, help="Hashes measured per cost")
+    args = parser.parse_args()
+
+    rounds = calibrate(args.target_ms, args.min_rounds, args.samples)
+    print(f"\nBCRYPT_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
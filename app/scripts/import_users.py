@@ -0,0 +1,188 @@
+"""Bulk user import command.
+
+Streams users (username, email, password) from a CSV or NDJSON file and
+creates them in chunks: uniqueness is checked with one query per chunk,
+passwords are hashed across a process pool and each chunk is inserted in a
+single transaction. Rejected rows are written to an NDJSON error file, in
+input order.
+
+    python -m app.scripts.import_users users.csv --errors import_errors.ndjson
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import IO, Iterator, List, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.core.counters import PLAYERS, stage_counters
+from app.core.database import engine, init_db
+from app.models import User
+from app.routers.auth.service import get_password_hash, user_db
+from app.schemas import UserSignUp
+
+Row = Tuple[int, dict]
+
+
+def read_rows(path: Path) -> Iterator[Row]:
+    """Yield (line number, row) pairs from a CSV or NDJSON file"""
+    with path.open(newline="", encoding="utf-8") as file:
+        if path.suffix.lower() == ".csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError:
+                        yield line_number, {"_error": "Invalid JSON"}
+
+
+def chunked(rows: Iterator[Row], size: int) -> Iterator[List[Row]]:
+    """Split rows into lists of at most size rows"""
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+class UserImporter:
+    """Imports chunks of users, tracking emails and usernames seen so far"""
+
+    def __init__(self, executor: Executor, errors: IO):
+        self.executor = executor
+        self.errors = errors
+        self.seen_emails: Set[str] = set()
+        self.seen_usernames: Set[str] = set()
+        self.rejected: List[Tuple[int, str]] = []
+        self.imported = 0
+        self.failed = 0
+
+    def import_chunk(self, chunk: List[Row], db_session: Session) -> None:
+        """Validate, hash and insert a chunk of rows, then write its rejected rows"""
+        try:
+            self.import_rows(chunk, db_session)
+        finally:
+            self.write_rejected()
+
+    def import_rows(self, chunk: List[Row], db_session: Session) -> None:
+        """Validate, hash and insert rows"""
+        candidates = []
+        for line_number, row in chunk:
+            if "_error" in row:
+                self.reject(line_number, row, row["_error"])
+                continue
+            try:
+                user = UserSignUp(**row)
+            except (ValidationError, TypeError) as error:
+                self.reject(line_number, row, str(error).splitlines()[0])
+                continue
+            if not (user.username and user.email and user.password):
+                self.reject(line_number, row, "Missing username, email or password")
+                continue
+            candidates.append((line_number, row, user))
+
+        existing_emails = user_db.get_existing_emails(
+            {user.email for _, _, user in candidates}, db_session=db_session
+        )
+        existing_usernames = user_db.get_existing_usernames(
+            {user.username for _, _, user in candidates}, db_session=db_session
+        )
+
+        accepted = []
+        for line_number, row, user in candidates:
+            if user.email in existing_emails or user.email in self.seen_emails:
+                self.reject(line_number, row, "Email already registered")
+            elif user.username in existing_usernames or user.username in self.seen_usernames:
+                self.reject(line_number, row, "Username already taken")
+            else:
+                self.seen_emails.add(user.email)
+                self.seen_usernames.add(user.username)
+                accepted.append((line_number, row, user))
+
+        hashes = self.executor.map(
+            get_password_hash,
+            [user.password for _, _, user in accepted],
+            chunksize=max(1, len(accepted) // (os.cpu_count() or 1)),
+        )
+        users = [
+            (
+                line_number,
+                row,
+                User(email=user.email, username=user.username, password_hash=hashed),
+            )
+            for (line_number, row, user), hashed in zip(accepted, hashes)
+        ]
+        self.insert(users, db_session)
+
+    def insert(self, users: List[Tuple[int, dict, User]], db_session: Session) -> None:
+        """Insert users in one transaction, isolating failures row by row"""
+        try:
+            stage_counters(db_session, {PLAYERS: len(users)})
+            user_db.create_many([user for _, _, user in users], db_session=db_session)
+            self.imported += len(users)
+            return
+        except IntegrityError:
+            db_session.rollback()
+
+        # Someone registered concurrently, find the offending rows
+        for line_number, row, user in users:
+            try:
+                stage_counters(db_session, {PLAYERS: 1})
+                user_db.create_many([user], db_session=db_session)
+                self.imported += 1
+            except IntegrityError:
+                db_session.rollback()
+                self.reject(line_number, row, "Email or username already registered")
+
+    def reject(self, line_number: int, row: dict, reason: str) -> None:
+        """Record a rejected row, without its password"""
+        self.failed += 1
+        safe_row = {key: value for key, value in row.items() if key != "password"}
+        error = json.dumps({"line": line_number, "error": reason, "row": safe_row})
+        self.rejected.append((line_number, error))
+
+    def write_rejected(self) -> None:
+        """Write the rejected rows of a chunk by line number, as they are found out of order"""
+        for _, error in sorted(self.rejected, key=lambda rejected: rejected[0]):
+            self.errors.write(error)
+            self.errors.write("\n")
+        self.rejected.clear()
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path, help="CSV or NDJSON file with users")
+    parser.add_argument("--errors", type=Path, default=Path("import_errors.ndjson"))
+    parser.add_argument("--chunk-size", type=int, default=1_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    init_db()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor, args.errors.open(
+        "w", encoding="utf-8"
+    ) as errors, Session(engine) as db_session:
+        importer = UserImporter(executor=executor, errors=errors)
+        for chunk in chunked(read_rows(args.path), args.chunk_size):
+            importer.import_chunk(chunk, db_session)
+            print(f"{importer.imported} imported, {importer.failed} rejected", flush=True)
+
+    elapsed = time.perf_counter() - start
+    total = importer.imported + importer.failed
+    print(
+        f"Imported {importer.imported} of {total} rows in {elapsed:.1f} s "
+        f"({total / elapsed if elapsed else 0:.0f} rows/s), errors in {args.errors}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Game session shard rebalancing command.
+
+Moves game sessions to the shard their user hashes to after the number of
+shards changes. Use --from-shards 0 to move them out of the main database
+when enabling sharding. Stop the app first, then set GAME_SHARDS to the new
+count once the command finishes.
+
+    python -m app.scripts.rebalance_shards --from-shards 4 --to-shards 8
+"""
+import argparse
+from collections import defaultdict
+from typing import List
+
+from sqlalchemy import delete, insert
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine as main_engine
+from app.core.shards import create_shard_engine, shard_index, shard_path
+from app.models import GameSession
+from app.routers.games.repository import GameRepository
+
+table = GameSession.__table__
+
+
+def move_rows(source: Engine, source_index: int | None, targets: List[Engine], chunk_size: int):
+    """Move every row of a source that belongs to another target shard"""
+    moved = 0
+    last_id = None
+    while True:
+        query = select(table).order_by(table.c.id).limit(chunk_size)
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+        with source.connect() as connection:
+            rows = connection.execute(query).all()
+        if not rows:
+            return moved
+        last_id = rows[-1].id
+
+        by_target = defaultdict(list)
+        for row in rows:
+            index = shard_index(row.user_id, len(targets))
+            if index != source_index:
+                by_target[index].append(dict(row._mapping))
+        if not by_target:
+            continue
+
+        # Insert before deleting, so an interrupted run can simply be restarted
+        moved_ids = []
+        for index, values in by_target.items():
+            with targets[index].begin() as connection:
+                connection.execute(insert(table).prefix_with("OR REPLACE"), values)
+            moved_ids.extend(value["id"] for value in values)
+        with source.begin() as connection:
+            connection.execute(delete(table).where(table.c.id.in_(moved_ids)))
+        moved += len(moved_ids)
+        print(f"Moved {moved} game sessions", flush=True)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from-shards", type=int, required=True, help="0 for the main database")
+    parser.add_argument("--to-shards", type=int, required=True)
+    parser.add_argument("--shard-dir", default=settings.GAME_SHARD_DIR)
+    parser.add_argument("--chunk-size", type=int, default=5_000)
+    args = parser.parse_args()
+    if args.to_shards < 1:
+        parser.error("--to-shards must be at least 1")
+    if args.from_shards < 0:
+        parser.error("--from-shards must be 0 or more")
+
+    targets = [create_shard_engine(index, args.shard_dir) for index in range(args.to_shards)]
+    if args.from_shards == 0:
+        sources = [(main_engine, None)]
+    else:
+        sources = [
+            (create_shard_engine(index, args.shard_dir), index)
+            for index in range(args.from_shards)
+        ]
+    for source, index in sources:
+        move_rows(source, index, targets, args.chunk_size)
+    # Each shard counts the games it holds
+    for target in targets:
+        with Session(target) as db_session:
+            GameRepository().reset_counters(db_session)
+
+    for index in range(args.to_shards, args.from_shards):
+        print(f"{shard_path(index, args.shard_dir)} is now empty and can be removed")
+    print(f"Done, set GAME_SHARDS={args.to_shards}")
+
+
+if __name__ == "__main__":
+    main()
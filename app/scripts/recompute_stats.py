@@ -0,0 +1,242 @@
+"""Player statistics recompute command.
+
+Recomputes every completed game's deviation and every player's statistics
+after TARGET_TIME_MS or the accuracy formula changes. Game sessions are read
+in chunks ordered by user into NumPy arrays and grouped with a sort and
+reduceat, so memory stays bounded by the chunk size (plus the games of a
+single player). Each chunk is fetched by its own query, so no read cursor is
+open while statistics are written; they go to a staging table one chunk per
+transaction, which replaces player_stats in one final transaction. The
+player statistics endpoint serves the deviation percentiles from that table.
+Use --verify to compare a sample of players with SQL.
+
+Servers cache leaderboard pages and recent results under generations kept
+in the cache, so with a shared CACHE_BACKEND they pick up the new numbers
+right away; with the in-process cache, restart them.
+
+    python -m app.scripts.recompute_stats --chunk-size 1000000 --verify 100
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+import numpy as np
+from sqlalchemy import MetaData, String, delete, func, insert, text, type_coerce, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.core.database import engine as main_engine
+from app.core.database import init_db
+from app.core.shards import get_shards
+from app.models import GameSession, GameStatus, PlayerStats
+from app.routers.games.service import calculate_accuracy_percentage, reset_game_counters
+
+PERCENTILES = (50, 90, 99)
+
+games = GameSession.__table__
+stats_table = PlayerStats.__table__
+staging_table = stats_table.to_metadata(MetaData(), name="player_stats_staging")
+user_key = type_coerce(games.c.user_id, String)
+
+Chunk = Tuple[np.ndarray, np.ndarray]  # User ids and durations, ordered by user
+
+
+def game_engines() -> List[Engine]:
+    """Engines holding the game_sessions table"""
+    return get_shards().engines if settings.GAME_SHARDS else [main_engine]
+
+
+def rewrite_deviations(engine: Engine) -> int:
+    """Recompute the stored deviation of every completed game from its duration"""
+    with engine.begin() as connection:
+        result = connection.execute(
+            update(games)
+            .where(games.c.status == GameStatus.COMPLETED)
+            .values(deviation_ms=func.abs(games.c.duration_ms - settings.TARGET_TIME_MS))
+        )
+    return result.rowcount
+
+
+def reseed_counters() -> None:
+    """Reset the global game counters to the rewritten deviations"""
+    with Session(main_engine) as db_session:
+        reset_game_counters(db_session)
+
+
+def fetch_games(engine: Engine, *criteria, limit: int | None = None) -> Chunk:
+    """Read the user ids and durations of completed games, ordered by user"""
+    query = (
+        select(user_key, games.c.duration_ms)
+        .where(games.c.status == GameStatus.COMPLETED, *criteria)
+        .order_by(games.c.user_id)
+        .limit(limit)
+    )
+    with engine.connect() as connection:
+        rows = connection.execute(query).all()
+    if not rows:
+        return np.empty(0, dtype="S32"), np.empty(0, dtype=np.int64)
+    user_ids, durations = zip(*rows)
+    return np.asarray(user_ids, dtype="S"), np.asarray(durations, dtype=np.int64)
+
+
+def read_chunks(engine: Engine, chunk_size: int) -> Iterator[Chunk]:
+    """Yield chunks of completed games holding every game of each of their users"""
+    after = ""
+    while True:
+        users, durations = fetch_games(engine, user_key > after, limit=chunk_size)
+        if len(users) == chunk_size:
+            # The last user may continue in the next chunk, hold it back
+            last_start = np.searchsorted(users, users[-1])
+            if last_start:
+                users, durations = users[:last_start], durations[:last_start]
+            else:  # A single player fills the chunk
+                users, durations = fetch_games(engine, user_key == users[-1].decode())
+        if not len(users):
+            return
+        yield users, durations
+        after = users[-1].decode()
+
+
+def percentile(deviations: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float):
+    """Linearly interpolated percentile of each sorted group, like np.percentile"""
+    position = (counts - 1) * (q / 100)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    low, high = deviations[starts + lower], deviations[starts + upper]
+    return low + (high - low) * (position - lower)
+
+
+def group_stats(users: np.ndarray, durations: np.ndarray) -> List[dict]:
+    """Statistics of each user in a chunk"""
+    deviations = np.abs(durations - settings.TARGET_TIME_MS)
+    order = np.lexsort((deviations, users))  # By user, then by deviation
+    users, deviations = users[order], deviations[order]
+
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    counts = np.diff(np.r_[starts, len(users)])
+    averages = np.add.reduceat(deviations, starts) / counts
+    best = deviations[starts]
+    worst = deviations[starts + counts - 1]
+    percentiles = [percentile(deviations, starts, counts, q) for q in PERCENTILES]
+    now = datetime.utcnow()
+
+    return [
+        {
+            "id": uuid.uuid4(),
+            "created_at": now,
+            "updated_at": now,
+            "user_id": uuid.UUID(users[start].decode()),
+            "completed_games": int(counts[index]),
+            "average_deviation_ms": round(float(averages[index]), 2),
+            "best_deviation_ms": int(best[index]),
+            "worst_deviation_ms": int(worst[index]),
+            "p50_deviation_ms": float(percentiles[0][index]),
+            "p90_deviation_ms": float(percentiles[1][index]),
+            "p99_deviation_ms": float(percentiles[2][index]),
+            "average_accuracy": calculate_accuracy_percentage(int(averages[index])),
+        }
+        for index, start in enumerate(starts)
+    ]
+
+
+def recompute(chunk_size: int) -> int:
+    """Replace player_stats with statistics computed from every game"""
+    with main_engine.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {staging_table.name}"))
+        connection.execute(
+            text(f"CREATE TABLE {staging_table.name} AS SELECT * FROM {stats_table.name} WHERE 0")
+        )
+    players = 0
+    for engine in game_engines():
+        for users, durations in read_chunks(engine, chunk_size):
+            rows = group_stats(users, durations)
+            with main_engine.begin() as connection:
+                connection.execute(insert(staging_table), rows)
+            players += len(rows)
+            print(f"Computed statistics of {players} players", flush=True)
+    with main_engine.begin() as connection:
+        connection.execute(delete(stats_table))
+        connection.execute(
+            text(f"INSERT INTO {stats_table.name} SELECT * FROM {staging_table.name}")
+        )
+        connection.execute(text(f"DROP TABLE {staging_table.name}"))
+    return players
+
+
+def verify(sample_size: int) -> int:
+    """Compare a random sample of player_stats with SQL, returning the mismatch count"""
+    with main_engine.connect() as connection:
+        sample = connection.execute(
+            select(stats_table).order_by(func.random()).limit(sample_size)
+        ).all()
+    mismatches = 0
+    for stats in sample:
+        engine = get_shards().engine_for(stats.user_id) if settings.GAME_SHARDS else main_engine
+        with engine.connect() as connection:
+            deviations = connection.execute(
+                select(func.abs(games.c.duration_ms - settings.TARGET_TIME_MS)).where(
+                    games.c.user_id == stats.user_id, games.c.status == GameStatus.COMPLETED
+                )
+            ).scalars().all()
+        average = sum(deviations) / len(deviations)
+        expected = (
+            len(deviations),
+            round(average, 2),
+            min(deviations),
+            max(deviations),
+            *(float(np.percentile(deviations, q)) for q in PERCENTILES),
+            calculate_accuracy_percentage(int(average)),
+        )
+        actual = (
+            stats.completed_games,
+            stats.average_deviation_ms,
+            stats.best_deviation_ms,
+            stats.worst_deviation_ms,
+            stats.p50_deviation_ms,
+            stats.p90_deviation_ms,
+            stats.p99_deviation_ms,
+            stats.average_accuracy,
+        )
+        if not np.allclose(actual, expected, rtol=0, atol=1e-6):
+            mismatches += 1
+            print(f"Mismatch for user {stats.user_id}: {actual} != {expected}")
+    return mismatches
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--verify", type=int, default=0, help="Players to check against SQL")
+    parser.add_argument(
+        "--keep-deviations", action="store_true", help="Do not rewrite stored deviations"
+    )
+    args = parser.parse_args()
+
+    init_db()
+    start = time.perf_counter()
+    if not args.keep_deviations:
+        rewritten = sum(rewrite_deviations(engine) for engine in game_engines())
+        reseed_counters()
+        print(f"Rewrote the deviation of {rewritten} games", flush=True)
+    players = recompute(args.chunk_size)
+    cache = get_cache()
+    cache.bump_generation("leaderboard")
+    cache.bump_generation("recent")
+    if not cache.shared:
+        print("CACHE_BACKEND is not shared: restart running servers to drop cached results")
+    print(f"Recomputed statistics of {players} players in {time.perf_counter() - start:.1f} s")
+
+    if args.verify:
+        mismatches = verify(args.verify)
+        print(f"Verified {args.verify} players against SQL, {mismatches} mismatches")
+        if mismatches:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Test configuration.
+
+Settings are read when app modules are imported, so the environment is set
+before any of them is.
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="timer_game_tests_")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{TEST_DIR}/test.db",
+    SECRET_KEY="test-secret",
+    BCRYPT_ROUNDS="4",
+    RATE_LIMIT_ENABLED="false",
+    CACHE_SQLITE_PATH=f"{TEST_DIR}/cache.db",
+    GAME_SHARD_DIR=f"{TEST_DIR}/shards",
+    JOURNAL_DIR=f"{TEST_DIR}/journal",
+    LEADERBOARD_SNAPSHOT_PATH=f"{TEST_DIR}/leaderboard.snapshot",
+)
+
+from fastapi.testclient import TestClient  # noqa: E402  pylint: disable=wrong-import-position
+
+from app.main import app  # noqa: E402  pylint: disable=wrong-import-position
+
+
+class FakeClock:
+    """Clock advanced by hand"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name="client")
+def fixture_client():
+    """Client of the app, with its lifespan running"""
+    with TestClient(app) as client:
+        yield client
+
+
+def register(client: TestClient, password: str = "password") -> dict:
+    """Register a new user, returning the signup form"""
+    name = uuid.uuid4().hex[:12]
+    form = {"username": name, "email": f"{name}@example.com", "password": password}
+    response = client.post("/auth/register", json=form)
+    assert response.status_code == 201, response.text
+    return form
+
+
+def login(client: TestClient, form: dict) -> dict:
+    """Log a user in, returning the token response"""
+    response = client.post(
+        "/auth/login", data={"username": form["email"], "password": form["password"]}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def auth_headers(tokens: dict) -> dict:
+    """Authorization header of a token response"""
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+@pytest.fixture(name="headers")
+def fixture_headers(client):
+    """Authorization header of a new user"""
+    return auth_headers(login(client, register(client)))
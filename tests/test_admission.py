@@ -0,0 +1,38 @@
+"""Admission control tests"""
+from app.core.admission import AdmissionController, LoopLagMonitor, Priority
+
+WINDOW_SAMPLES = 30
+
+
+def controller() -> AdmissionController:
+    """Controller shedding from 100 ms of lag sustained over 30 samples"""
+    monitor = LoopLagMonitor(interval_seconds=0.1, window_seconds=3)
+    return AdmissionController(monitor=monitor, lag_threshold_ms=100, max_concurrency=100)
+
+
+def test_one_slow_call_does_not_shed():
+    admission = controller()
+    for _ in range(WINDOW_SAMPLES):
+        admission.monitor.sample(1)
+    admission.monitor.sample(300)  # One bcrypt login blocking the loop
+
+    assert admission.try_acquire(Priority.ANALYTICS)
+    assert admission.monitor.max_lag_ms == 300
+
+
+def test_sustained_lag_sheds_low_priorities_first():
+    admission = controller()
+    for _ in range(WINDOW_SAMPLES):
+        admission.monitor.sample(150)
+
+    assert not admission.try_acquire(Priority.ANALYTICS)
+    assert admission.try_acquire(Priority.NORMAL)
+    assert admission.try_acquire(Priority.CRITICAL)
+
+
+def test_lag_is_ignored_until_the_window_is_full():
+    admission = controller()
+    for _ in range(WINDOW_SAMPLES - 1):
+        admission.monitor.sample(1_000)
+
+    assert admission.try_acquire(Priority.ANALYTICS)
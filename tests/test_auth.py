@@ -0,0 +1,142 @@
+"""Authentication tests"""
+import asyncio
+
+from sqlmodel import Session
+
+from app.core.cache import MemoryCache
+from app.core.config import settings
+from app.core.database import engine
+from app.routers.auth import service as auth_service
+from app.scripts import calibrate_bcrypt
+from tests.conftest import FakeClock, auth_headers, login, register
+
+
+def refresh(client, tokens: dict):
+    """Exchange a refresh token"""
+    return client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+
+def test_register_returns_the_counted_user(client):
+    stats = client.get("/analytics/global", headers=auth_headers(login(client, register(client))))
+    players = stats.json()["total_players"]
+
+    response = client.post(
+        "/auth/register",
+        json={"username": "counted", "email": "counted@example.com", "password": "password"},
+    )
+
+    assert response.status_code == 201
+    assert response.json()["username"] == "counted"
+    assert response.json()["id"]
+    tokens = login(client, {"email": "counted@example.com", "password": "password"})
+    stats = client.get("/analytics/global", headers=auth_headers(tokens))
+    assert stats.json()["total_players"] == players + 1
+
+
+def test_refresh_rotates_tokens(client):
+    tokens = login(client, register(client))
+
+    response = refresh(client, tokens)
+
+    assert response.status_code == 200
+    assert client.post("/games/start", headers=auth_headers(response.json())).status_code == 200
+
+
+def test_refresh_token_reuse_revokes_the_login(client):
+    tokens = login(client, register(client))
+    rotated = refresh(client, tokens).json()
+
+    assert refresh(client, tokens).status_code == 401
+    assert refresh(client, rotated).status_code == 401
+
+
+def test_logout_revokes_the_refresh_token(client):
+    tokens = login(client, register(client))
+
+    assert client.post("/auth/logout", headers=auth_headers(tokens)).status_code == 200
+
+    assert refresh(client, tokens).status_code == 401
+
+
+def test_logout_after_a_refresh_revokes_the_rotated_token(client):
+    rotated = refresh(client, login(client, register(client))).json()
+
+    assert client.post("/auth/logout", headers=auth_headers(rotated)).status_code == 200
+
+    assert refresh(client, rotated).status_code == 401
+
+
+def test_logout_keeps_other_logins(client):
+    form = register(client)
+    phone, laptop = login(client, form), login(client, form)
+
+    client.post("/auth/logout", headers=auth_headers(phone))
+
+    assert refresh(client, laptop).status_code == 200
+
+
+def test_per_process_token_generations_expire_quickly(client, monkeypatch):
+    clock = FakeClock()
+    cache = MemoryCache(clock=clock)
+    monkeypatch.setattr(auth_service, "get_cache", lambda: cache)
+    form = register(client)
+    with Session(engine) as session:
+        user = auth_service.user_db.get_by_email(form["email"], db_session=session)
+        assert asyncio.run(auth_service.get_token_generation(user.id, session)) == 0
+
+        # Another worker handles a logout, this worker's cache is not told
+        auth_service.user_db.increment_token_generation(item_id=user.id, db_session=session)
+        clock.now += settings.TOKEN_GENERATION_LOCAL_CACHE_TTL_SECONDS
+
+        assert asyncio.run(auth_service.get_token_generation(user.id, session)) == 1
+
+
+def test_logout_everywhere_revokes_other_logins(client):
+    form = register(client)
+    laptop, phone = login(client, form), login(client, form)
+    assert client.post("/games/start", headers=auth_headers(phone)).status_code == 200
+
+    response = client.post("/auth/logout/all", headers=auth_headers(laptop))
+
+    assert response.status_code == 200
+    assert client.post("/games/start", headers=auth_headers(phone)).status_code == 401
+    assert refresh(client, phone).status_code == 401
+
+
+def stored_password_hash(email: str) -> str:
+    """Password hash of a user as stored in the database"""
+    with Session(engine) as session:
+        return auth_service.user_db.get_by_email(email, db_session=session).password_hash
+
+
+def test_login_upgrades_a_hash_to_the_configured_cost(client, monkeypatch):
+    form = register(client)
+    assert stored_password_hash(form["email"]).startswith("$2b$04$")
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    auth_service.get_pwd_context.cache_clear()
+    try:
+        login(client, form)
+        login(client, form)  # Verified against the upgraded hash
+    finally:
+        auth_service.get_pwd_context.cache_clear()
+
+    assert stored_password_hash(form["email"]).startswith("$2b$05$")
+
+
+def test_calibration_picks_the_highest_cost_within_the_target(monkeypatch):
+    # Doubles with each cost: 163.8 ms at 14, 327.7 ms at 15
+    monkeypatch.setattr(
+        calibrate_bcrypt, "measure_hash_ms", lambda rounds, samples: 2**rounds / 100
+    )
+
+    assert calibrate_bcrypt.calibrate(target_ms=250, min_rounds=10, samples=1) == 14
+
+
+def test_calibration_stays_within_its_bounds(monkeypatch):
+    monkeypatch.setattr(calibrate_bcrypt, "measure_hash_ms", lambda rounds, samples: 1_000.0)
+    assert calibrate_bcrypt.calibrate(target_ms=250, min_rounds=10, samples=1) == 10
+
+    monkeypatch.setattr(calibrate_bcrypt, "measure_hash_ms", lambda rounds, samples: 0.0)
+    rounds = calibrate_bcrypt.calibrate(target_ms=250, min_rounds=10, samples=1)
+    assert rounds == calibrate_bcrypt.MAX_ROUNDS
@@ -0,0 +1,48 @@
+"""Cache backend tests"""
+import pytest
+from jose import jwt
+
+from app.core.cache import MemoryCache, SQLiteCache, get_cache
+from app.routers.auth import service as auth_service
+from tests.conftest import TEST_DIR, auth_headers, login, register
+
+
+def test_memory_cache_counters_are_never_evicted():
+    cache = MemoryCache(max_size=2)
+    cache.bump_generation("leaderboard")
+    cache.set("first", 1, ttl_seconds=60)
+    cache.set("second", 2, ttl_seconds=60)
+    cache.set("third", 3, ttl_seconds=60)
+
+    assert cache.get_generation("leaderboard") == 1
+    assert cache.get("first") is None
+    assert cache.get("second") == 2
+    assert cache.get("third") == 3
+
+
+def test_verified_tokens_are_not_cached_per_process(client):
+    tokens = login(client, register(client))
+    client.get("/leaderboard", headers=auth_headers(tokens))
+
+    jti = jwt.get_unverified_claims(tokens["access_token"])["jti"]
+    assert get_cache().get(f"auth:{jti}") is None
+
+
+@pytest.fixture(name="shared_cache")
+def fixture_shared_cache(monkeypatch):
+    """Use a cache shared by workers for authentication"""
+    cache = SQLiteCache(f"{TEST_DIR}/shared_cache.db")
+    monkeypatch.setattr(auth_service, "get_cache", lambda: cache)
+    return cache
+
+
+def test_logout_revokes_a_cached_token(client, shared_cache):
+    tokens = login(client, register(client))
+    headers = auth_headers(tokens)
+    assert client.get("/leaderboard", headers=headers).status_code == 200
+    jti = jwt.get_unverified_claims(tokens["access_token"])["jti"]
+    assert shared_cache.get(f"auth:{jti}") is not None
+
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+
+    assert client.get("/leaderboard", headers=headers).status_code == 401
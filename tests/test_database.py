@@ -0,0 +1,28 @@
+"""Database schema tests"""
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.database import add_missing_columns
+from tests.conftest import TEST_DIR
+
+
+def test_missing_columns_are_added_to_existing_tables():
+    path = Path(TEST_DIR) / "baseline.db"
+    baseline = create_engine(f"sqlite:///{path}")
+    with baseline.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE users (id CHAR(32) PRIMARY KEY, created_at DATETIME, "
+                "updated_at DATETIME, username VARCHAR, email VARCHAR, password_hash VARCHAR)"
+            )
+        )
+        connection.execute(text("INSERT INTO users (id, username) VALUES ('1', 'old')"))
+
+    add_missing_columns(baseline)
+    add_missing_columns(baseline)  # Idempotent
+
+    columns = {column["name"] for column in inspect(baseline).get_columns("users")}
+    assert "token_generation" in columns
+    with baseline.connect() as connection:
+        assert connection.execute(text("SELECT token_generation FROM users")).scalar() == 0
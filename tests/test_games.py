@@ -0,0 +1,58 @@
+"""Game routes tests"""
+from datetime import datetime, timedelta
+
+
+def test_stop_is_idempotent(client, headers):
+    session_id = client.post("/games/start", headers=headers).json()["session_id"]
+    retry_headers = {**headers, "Idempotency-Key": "stop-1"}
+
+    first = client.post(f"/games/{session_id}/stop", headers=retry_headers)
+    retry = client.post(f"/games/{session_id}/stop", headers=retry_headers)
+
+    assert first.status_code == 200
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+
+
+def test_batch_stop_is_timed_by_the_server(client, headers):
+    started = client.post("/games/start", headers=headers).json()
+    start_time = datetime.fromisoformat(started["start_time"])
+    claimed_stop = start_time + timedelta(milliseconds=10_000)
+
+    response = client.post(
+        "/games/stop:batch",
+        headers=headers,
+        json={
+            "items": [{"session_id": started["session_id"], "stop_time": claimed_stop.isoformat()}]
+        },
+    )
+
+    result = response.json()["results"][0]["result"]
+    assert result["duration_ms"] < 1_000
+    assert result["deviation_ms"] > 9_000
+
+
+def test_batch_stop_reports_unknown_sessions(client, headers):
+    session_id = client.post("/games/start", headers=headers).json()["session_id"]
+    client.post(f"/games/{session_id}/stop", headers=headers)
+
+    response = client.post(
+        "/games/stop:batch", headers=headers, json={"items": [{"session_id": session_id}]}
+    )
+
+    assert response.json()["results"][0]["error"] == "Game session not found"
+
+
+def test_each_stop_is_counted_once(client, headers):
+    def total_games():
+        return client.get("/analytics/global", headers=headers).json()["total_games"]
+
+    before = total_games()
+    single = client.post("/games/start", headers=headers).json()["session_id"]
+    client.post(f"/games/{single}/stop", headers=headers)
+    client.post(f"/games/{single}/stop", headers=headers)
+    batched = client.post("/games/start", headers=headers).json()["session_id"]
+    for _ in range(2):
+        client.post("/games/stop:batch", headers=headers, json={"items": [{"session_id": batched}]})
+
+    assert total_games() == before + 2
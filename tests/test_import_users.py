@@ -0,0 +1,44 @@
+"""Bulk user import tests"""
+import io
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.routers.auth.service import user_db
+from app.scripts.import_users import UserImporter, chunked, read_rows
+from tests.conftest import register
+
+
+def test_an_import_keeps_valid_rows_and_reports_invalid_ones_in_order(client, tmp_path):
+    taken = register(client)
+    name = uuid.uuid4().hex[:8]
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "username,email,password\n"
+        f"{name}-a,{name}-a@example.com,password\n"  # Line 2
+        f"{name}-c,{taken['email']},password\n"  # Already registered
+        f"{name}-b,{name}-b@example.com,\n"  # Missing password, found first
+        f"{name}-d,{name}-a@example.com,password\n"  # Earlier in the file
+        f"{name}-e,{name}-e@example.com\n"  # Missing column
+        f"{name}-f,{name}-f@example.com,password\n"
+        f"{taken['username']},{name}-g@example.com,password\n",  # Line 8
+        encoding="utf-8",
+    )
+    errors = io.StringIO()
+
+    with ThreadPoolExecutor(max_workers=2) as executor, Session(engine) as db_session:
+        importer = UserImporter(executor=executor, errors=errors)
+        for chunk in chunked(read_rows(path), 4):
+            importer.import_chunk(chunk, db_session)
+
+        assert user_db.get_existing_emails(
+            {f"{name}-{suffix}@example.com" for suffix in "abcdefg"}, db_session=db_session
+        ) == {f"{name}-a@example.com", f"{name}-f@example.com"}
+
+    rejected = [json.loads(line) for line in errors.getvalue().splitlines()]
+    assert [error["line"] for error in rejected] == [3, 4, 5, 6, 8]
+    assert (importer.imported, importer.failed) == (2, 5)
+    assert all("password" not in error["row"] for error in rejected)
@@ -0,0 +1,213 @@
+"""Game result journal tests"""
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from jose import jwt
+from sqlmodel import Session, select
+
+from app.core.cache import MemoryCache, SQLiteCache
+from app.core.counters import DEVIATION_SUM, GAMES_PLAYED
+from app.core.database import engine
+from app.models import GameSession, GameStatus
+from app.routers.games import service
+from app.routers.games.journal import ResultJournal
+from tests.conftest import FakeClock
+
+GAMES = 10
+BATCH = 4
+
+# Journals every result, then dies while applying the second batch
+CRASHING_WORKER = """
+import asyncio, json, os, signal, sys, uuid
+from datetime import datetime
+
+from app.routers.games import service
+from app.routers.games.journal import GameResult
+
+crash_point, games = sys.argv[1], json.loads(sys.argv[2])
+journal = service.result_journal
+batches = 0
+
+
+def kill():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def complete_many(results, db_session):
+    global batches
+    batches += 1
+    if batches == 2 and crash_point == "before_commit":
+        db_session.commit = kill
+    return type(service.game_db).complete_many(service.game_db, results, db_session)
+
+
+def write_offset(path, offset):
+    if batches == 2 and crash_point == "after_commit":
+        kill()
+    type(journal)._write_offset(journal, path, offset)
+
+
+async def main():
+    await journal.start()
+    for session_id, user_id, duration_ms in games:
+        result = GameResult(uuid.UUID(session_id), uuid.UUID(user_id), duration_ms,
+                            duration_ms - 9_000, datetime.utcnow())
+        await journal.append(result)
+    service.game_db.complete_many = complete_many
+    journal._write_offset = write_offset
+    journal.apply_all(journal.path)
+
+
+asyncio.run(main())
+"""
+
+
+def start_games(count: int) -> list:
+    """Insert started game sessions, returning (session id, user id, duration) triples"""
+    games = [(str(uuid.uuid4()), str(uuid.uuid4()), 9_000 + index) for index in range(count)]
+    with Session(engine) as db_session:
+        for session_id, user_id, _ in games:
+            db_session.add(
+                GameSession(
+                    id=uuid.UUID(session_id),
+                    user_id=uuid.UUID(user_id),
+                    start_time=datetime.utcnow(),
+                    status=GameStatus.STARTED,
+                )
+            )
+        db_session.commit()
+    return games
+
+
+def completed_durations(games: list) -> dict:
+    """Durations of the completed games among some, by session id"""
+    session_ids = [uuid.UUID(session_id) for session_id, _, _ in games]
+    with Session(engine) as db_session:
+        statement = select(GameSession).where(
+            GameSession.id.in_(session_ids), GameSession.status == GameStatus.COMPLETED
+        )
+        return {str(game.id): game.duration_ms for game in db_session.exec(statement)}
+
+
+@pytest.mark.parametrize("crash_point", ["before_commit", "after_commit"])
+def test_results_survive_an_applier_crash(client, tmp_path, monkeypatch, crash_point):
+    games = start_games(GAMES)
+    with Session(engine) as db_session:
+        counters_before = service.get_game_counters(db_session)
+    env = {
+        **os.environ,
+        "JOURNAL_ENABLED": "true",
+        "JOURNAL_DIR": str(tmp_path),
+        "JOURNAL_APPLY_INTERVAL_MS": "3600000",  # Only the test applies
+        "JOURNAL_APPLY_BATCH": str(BATCH),
+    }
+    worker = subprocess.run(
+        [sys.executable, "-c", CRASHING_WORKER, crash_point, json.dumps(games)],
+        cwd=Path(__file__).parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert worker.returncode == -signal.SIGKILL, worker.stderr
+
+    applied_before = completed_durations(games)
+    assert len(applied_before) == (2 * BATCH if crash_point == "after_commit" else BATCH)
+
+    replayed = []
+    complete_many = service.game_db.complete_many
+
+    def recording_complete_many(results, db_session):
+        applied = complete_many(results, db_session)
+        replayed.extend(applied)
+        return applied
+
+    monkeypatch.setattr(service.game_db, "complete_many", recording_complete_many)
+    journal = ResultJournal(str(tmp_path), service.apply_game_results, 2, 200, BATCH, 1_048_576)
+    journal.recover_orphans()
+
+    replayed_ids = {str(result.session_id) for result in replayed}
+    assert not replayed_ids & applied_before.keys()
+    assert completed_durations(games) == {
+        session_id: duration_ms for session_id, _, duration_ms in games
+    }
+    assert not list(tmp_path.glob("results-*"))
+    with Session(engine) as db_session:
+        counters = service.get_game_counters(db_session)
+    assert counters[GAMES_PLAYED] == counters_before[GAMES_PLAYED] + GAMES
+    assert counters[DEVIATION_SUM] == counters_before[DEVIATION_SUM] + sum(range(GAMES))
+
+
+def test_journal_is_named_after_the_process_that_starts_it(tmp_path):
+    journal = ResultJournal(str(tmp_path), lambda results: None, 2, 200, BATCH, 1_048_576)
+    assert journal.path is None  # Not yet known when a worker is forked
+
+    async def start_and_stop():
+        await journal.start()
+        try:
+            assert journal.path == tmp_path / f"results-{os.getpid()}.journal"
+            assert journal.path.exists()
+        finally:
+            await journal.stop()
+
+    asyncio.run(start_and_stop())
+
+
+def test_a_result_is_claimed_once_across_workers(tmp_path, monkeypatch):
+    workers = [SQLiteCache(str(tmp_path / "cache.db")) for _ in range(2)]
+    monkeypatch.setattr(service, "result_journal", SimpleNamespace(pending=set()))
+    game_id = uuid.uuid4()
+
+    monkeypatch.setattr(service, "get_cache", lambda: workers[0])
+    assert service.claim_game_result(game_id)
+    monkeypatch.setattr(service, "get_cache", lambda: workers[1])
+    assert service.is_result_pending(game_id)
+    assert not service.claim_game_result(game_id)
+
+
+def test_batch_stops_release_their_claims(client, headers, monkeypatch):
+    monkeypatch.setattr(service, "result_journal", SimpleNamespace(pending=set()))
+    user_id = jwt.get_unverified_claims(headers["Authorization"].split()[1])["uid"]
+    stopped = client.post("/games/start", headers=headers).json()["session_id"]
+    expired = uuid.uuid4()
+    with Session(engine) as db_session:
+        db_session.add(
+            GameSession(
+                id=expired,
+                user_id=uuid.UUID(user_id),
+                start_time=datetime.utcnow() - timedelta(days=1),
+                status=GameStatus.STARTED,
+            )
+        )
+        db_session.commit()
+
+    response = client.post(
+        "/games/stop:batch",
+        headers=headers,
+        json={"items": [{"session_id": stopped}, {"session_id": str(expired)}]},
+    )
+
+    assert [result["error"] for result in response.json()["results"]] == [
+        None,
+        "This game session has expired",
+    ]
+    for game_id in (uuid.UUID(stopped), expired):
+        assert not service.is_result_pending(game_id)
+
+
+def test_an_expired_claim_can_be_taken_again():
+    clock = FakeClock()
+    cache = MemoryCache(clock=clock)
+    assert cache.add("key", True, ttl_seconds=1)
+    assert not cache.add("key", True, ttl_seconds=1)
+    clock.now = 1
+    assert cache.add("key", True, ttl_seconds=1)
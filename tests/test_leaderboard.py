@@ -0,0 +1,93 @@
+"""Leaderboard routes tests"""
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from jose import jwt
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models import GameSession, GameStatus
+from app.routers.leaderboard.snapshot import (
+    LeaderboardSnapshot,
+    RankedEntry,
+    build_snapshot,
+    write_snapshot,
+)
+from tests.conftest import auth_headers, login, register
+
+
+def play(client, deviations: list) -> tuple:
+    """Register a player with completed games, returning their id and headers"""
+    tokens = login(client, register(client))
+    user_id = uuid.UUID(jwt.get_unverified_claims(tokens["access_token"])["uid"])
+    with Session(engine) as db_session:
+        for deviation_ms in deviations:
+            db_session.add(
+                GameSession(
+                    user_id=user_id,
+                    start_time=datetime.utcnow(),
+                    stop_time=datetime.utcnow(),
+                    duration_ms=settings.TARGET_TIME_MS + deviation_ms,
+                    deviation_ms=deviation_ms,
+                    status=GameStatus.COMPLETED,
+                )
+            )
+        db_session.commit()
+    return user_id, auth_headers(tokens)
+
+
+def test_rank_route_reads_the_database_without_a_snapshot(client):
+    user_id, headers = play(client, [4_321, 4_322])
+
+    response = client.get(f"/leaderboard/rank/{user_id}", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["average_deviation_ms"] == 4_321.5
+    assert client.get(f"/leaderboard/rank/{uuid.uuid4()}", headers=headers).status_code == 404
+
+
+def test_tied_players_are_ranked_alike_with_and_without_the_snapshot(client, monkeypatch):
+    players = sorted(play(client, [1_234, 1_235]) for _ in range(2))
+    headers = players[0][1]
+
+    def ranks():
+        return [
+            client.get(f"/leaderboard/rank/{user_id}", headers=headers).json()["rank"]
+            for user_id, _ in players
+        ]
+
+    from_database = ranks()
+    build_snapshot(Path(settings.LEADERBOARD_SNAPSHOT_PATH))
+    monkeypatch.setattr(settings, "LEADERBOARD_SNAPSHOT_ENABLED", True)
+
+    assert from_database[1] == from_database[0] + 1
+    assert ranks() == from_database
+
+
+def test_snapshot_round_trip(tmp_path):
+    # User ids out of order, so find() has to search the index
+    players = [
+        (uuid.UUID(int=index * 7 % 10 + 1), index + 1, 100.0 + index, 50 + index)
+        for index in range(10)
+    ]
+    usernames = {player[0]: f"player{index}" for index, player in enumerate(players)}
+    path = tmp_path / "leaderboard.snapshot"
+    write_snapshot(path, players, usernames)
+
+    snapshot = LeaderboardSnapshot(str(path))
+    assert snapshot.refresh()
+    assert snapshot.total_players == 10
+
+    page = list(snapshot.entries(offset=8, limit=5))
+    assert [entry.rank for entry in page] == [9, 10]
+    assert [entry.username for entry in page] == ["player8", "player9"]
+    assert page[0] == RankedEntry(9, players[8][0], "player8", 9, 108.0, 58)
+    assert list(snapshot.entries(offset=20, limit=5)) == []
+
+    for rank, player in enumerate(players, 1):
+        entry = snapshot.find(player[0])
+        assert (entry.rank, entry.user_id, entry.total_games) == (rank, player[0], player[1])
+    assert snapshot.find(uuid.UUID(int=0)) is None
+    assert snapshot.find(uuid.UUID(int=2**128 - 1)) is None
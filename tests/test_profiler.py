@@ -0,0 +1,120 @@
+"""Sampling profiler tests"""
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.core.profiler import ProfilerMiddleware, profiler, span
+from tests.conftest import auth_headers, login, register
+
+
+def admin_headers(client, monkeypatch) -> dict:
+    """Authorization header of a new user listed in ADMIN_EMAILS"""
+    form = register(client)
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", form["email"])
+    return auth_headers(login(client, form))
+
+
+def profiled_app() -> FastAPI:
+    """App with a profiled route, a route left alone and a failing route"""
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware)
+
+    @app.get("/profiled")
+    async def profiled_work():
+        with span("test.profiled"):
+            time.sleep(0.2)  # Blocks the loop, so the request is sampled
+
+    @app.get("/other")
+    async def other_work():
+        time.sleep(0.2)
+
+    @app.get("/failing")
+    async def failing_work():
+        raise RuntimeError("Request failed")
+
+    return app
+
+
+def route(app: FastAPI, path: str):
+    """Route of an app by path"""
+    return next(route for route in app.routes if getattr(route, "path", None) == path)
+
+
+def test_profiling_is_not_found_when_disabled(client, monkeypatch):
+    headers = admin_headers(client, monkeypatch)
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", False)
+    response = client.post("/admin/profile", params={"seconds": 0.1}, headers=headers)
+    assert response.status_code == 404
+
+
+def test_profiling_is_for_admins_only(client, headers, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", True)
+    response = client.post("/admin/profile", params={"seconds": 0.1}, headers=headers)
+    assert response.status_code == 403
+
+
+def test_spans_label_the_sampled_stacks():
+    done = threading.Event()
+
+    def work():
+        while not done.is_set():
+            with span("test.work"):
+                time.sleep(0.01)
+
+    worker = threading.Thread(target=work, name="worker")
+    worker.start()
+    try:
+        result = asyncio.run(profiler.profile(0.3))
+    finally:
+        done.set()
+        worker.join()
+
+    stacks = result.collapsed().splitlines()
+    assert any(stack.startswith("worker;") and "[test.work]" in stack for stack in stacks)
+
+
+def test_route_profiles_only_sample_that_route():
+    app = profiled_app()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            recording = asyncio.create_task(
+                profiler.profile_route(route(app, "/profiled"), requests=1, timeout=30)
+            )
+            await asyncio.sleep(0)  # Let the profile start
+            await client.get("/other")
+            assert not recording.done()
+            await client.get("/profiled")
+            return await asyncio.wait_for(recording, 5)
+
+    result = asyncio.run(run())
+
+    collapsed = result.collapsed()
+    assert result.samples > 0
+    assert all("[route /profiled]" in stack for stack in collapsed.splitlines())
+    assert "[test.profiled]" in collapsed
+    assert "other_work" not in collapsed
+
+
+def test_failed_requests_count_towards_a_route_profile():
+    app = profiled_app()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            recording = asyncio.create_task(
+                profiler.profile_route(route(app, "/failing"), requests=1, timeout=30)
+            )
+            await asyncio.sleep(0)
+            with pytest.raises(RuntimeError):
+                await client.get("/failing")
+            await asyncio.wait_for(recording, 5)  # Not the 30 s timeout
+            assert profiler.route is None
+
+    asyncio.run(run())
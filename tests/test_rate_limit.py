@@ -0,0 +1,50 @@
+"""Rate limiting tests"""
+from starlette.requests import Request
+
+from app.core.rate_limit import TokenBucketLimiter, token_user_id
+from app.models import User
+from app.routers.auth.service import access_token_claims, create_access_token
+from tests.conftest import FakeClock
+
+
+def make_request(token: str | None = None, host: str = "10.0.0.1") -> Request:
+    """Request from a client, with an optional bearer token"""
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "headers": headers, "client": (host, 1234)})
+
+
+def test_bucket_allows_a_burst_then_refills():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter("test", per_minute=60, burst=2, clock=clock)
+
+    assert [limiter.acquire("user") for _ in range(3)] == [0.0, 0.0, 1.0]
+    clock.now += 1.0
+    assert limiter.acquire("user") == 0.0
+
+
+def test_key_table_is_capped():
+    limiter = TokenBucketLimiter("test", per_minute=60, burst=2, clock=FakeClock(), max_keys=3)
+
+    for key in range(10):
+        limiter.acquire(key)
+
+    assert limiter.stats()["keys"] == 3
+
+
+def test_signed_tokens_are_keyed_by_user_id_across_ips():
+    user = User(username="player", email="player@example.com", password_hash="")
+    token, _ = create_access_token(data=access_token_claims(user))
+
+    assert token_user_id(make_request(token, host="10.0.0.1")) == str(user.id)
+    assert token_user_id(make_request(token, host="10.0.0.2")) == str(user.id)
+
+
+def test_forged_tokens_share_the_client_ip_bucket():
+    user = User(username="player", email="player@example.com", password_hash="")
+    token, _ = create_access_token(data=access_token_claims(user))
+    header, payload, signature = token.split(".")
+    forged = f"{header}.{payload}.{signature[::-1]}"
+
+    assert token_user_id(make_request(forged)) == "10.0.0.1"
+    assert token_user_id(make_request("not-a-token")) == "10.0.0.1"
+    assert token_user_id(make_request()) == "10.0.0.1"
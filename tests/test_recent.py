@@ -0,0 +1,57 @@
+"""Recent game results tests"""
+import sys
+import uuid
+
+from sqlmodel import Session
+
+from app.core.cache import SQLiteCache
+from app.core.database import engine
+from app.routers.games import service
+from app.routers.games.recent import RecentResults, UserTotals
+from tests.conftest import TEST_DIR
+
+USERS = 1_000_000
+SAMPLED_USERS = 100_000  # Loading all of them takes seconds, the footprint grows linearly
+MAX_BYTES_PER_USER = 1_024
+
+
+def footprint(recent: RecentResults) -> int:
+    """Bytes held by a store: its columns, its slot table and the keys and values in it"""
+    columns = sum(
+        sys.getsizeof(value) for value in vars(recent).values() if not isinstance(value, int)
+    )
+    slots = sum(
+        sys.getsizeof(user_id) + sys.getsizeof(user_id.int) + sys.getsizeof(slot)
+        for user_id, slot in recent._slots.items()  # pylint: disable=protected-access
+    )
+    return columns + slots
+
+
+def test_a_million_users_fit_in_a_bounded_footprint():
+    recent = RecentResults(per_user=service.RECENT_GAMES, max_users=USERS)
+    totals = UserTotals(
+        total_games=10,
+        completed_games=10,
+        deviation_sum=0,
+        best_deviation_ms=0,
+        worst_deviation_ms=0,
+    )
+    for index in range(SAMPLED_USERS):
+        recent.load(uuid.UUID(int=index), 0, totals, [])
+
+    assert len(recent) == SAMPLED_USERS
+    projected_bytes = footprint(recent) * USERS // SAMPLED_USERS
+    assert projected_bytes < MAX_BYTES_PER_USER * USERS
+
+
+def test_recent_results_stay_in_the_database_without_a_shared_cache(client, monkeypatch):
+    user_id = uuid.uuid4()
+    with Session(engine) as db_session:
+        service.get_recent_results(db_session=db_session, user_id=user_id)
+        assert service.recent_results.get(user_id, 0) is None
+
+        shared = SQLiteCache(f"{TEST_DIR}/recent_cache.db")
+        monkeypatch.setattr(service, "get_cache", lambda: shared)
+        service.get_recent_results(db_session=db_session, user_id=user_id)
+        version = shared.get_generation(f"recent:{user_id}")
+        assert service.recent_results.get(user_id, version) is not None
@@ -0,0 +1,86 @@
+"""Player statistics recompute tests"""
+import uuid
+from datetime import datetime
+
+from jose import jwt
+from sqlalchemy import inspect
+from sqlmodel import Session, select
+
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.core.database import engine
+from app.models import GameSession, GameStatus, PlayerStats
+from app.routers.games import service
+from app.routers.games.recent import UserTotals
+from app.scripts.recompute_stats import recompute
+from tests.conftest import login, register
+
+
+def complete_games(user_id: uuid.UUID, durations: list) -> None:
+    """Insert completed games of a user"""
+    with Session(engine) as db_session:
+        for duration_ms in durations:
+            db_session.add(
+                GameSession(
+                    user_id=user_id,
+                    start_time=datetime.utcnow(),
+                    stop_time=datetime.utcnow(),
+                    duration_ms=duration_ms,
+                    deviation_ms=abs(duration_ms - settings.TARGET_TIME_MS),
+                    status=GameStatus.COMPLETED,
+                )
+            )
+        db_session.commit()
+
+
+def player_stats(user_id: uuid.UUID) -> PlayerStats | None:
+    """Recomputed statistics of a player"""
+    with Session(engine) as db_session:
+        statement = select(PlayerStats).where(PlayerStats.user_id == user_id)
+        return db_session.exec(statement).first()
+
+
+def test_players_are_never_split_across_chunks(client):
+    durations = {
+        uuid.uuid4(): [10_000, 10_100, 10_200, 10_300, 10_400],  # Fills a chunk alone
+        uuid.uuid4(): [9_000],
+        uuid.uuid4(): [10_050, 9_950],
+    }
+    for user_id, games in durations.items():
+        complete_games(user_id, games)
+
+    recompute(chunk_size=3)
+
+    for user_id, games in durations.items():
+        deviations = [abs(game - settings.TARGET_TIME_MS) for game in games]
+        stats = player_stats(user_id)
+        assert stats.completed_games == len(games)
+        assert stats.average_deviation_ms == round(sum(deviations) / len(deviations), 2)
+        assert stats.worst_deviation_ms == max(deviations)
+    assert "player_stats_staging" not in inspect(engine).get_table_names()
+
+
+def test_user_stats_serve_recomputed_percentiles(client):
+    tokens = login(client, register(client))
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    user_id = jwt.get_unverified_claims(tokens["access_token"])["uid"]
+    complete_games(uuid.UUID(user_id), [10_000, 10_100, 10_300])
+
+    before = client.get(f"/analytics/user/{user_id}", headers=headers).json()
+    recompute(chunk_size=1_000)
+    after = client.get(f"/analytics/user/{user_id}", headers=headers).json()
+
+    assert before["deviation_percentiles"] is None
+    assert after["deviation_percentiles"]["p50_deviation_ms"] == 100
+    assert after["completed_games"] == 3
+
+
+def test_a_recompute_drops_recent_results_of_running_servers():
+    user_id = uuid.uuid4()
+    service.sync_recent_results()
+    service.recent_results.load(user_id, 0, UserTotals(1, 1, 5, 5, 5), [])
+    assert service.recent_results.get(user_id, 0) is not None
+
+    get_cache().bump_generation("recent")  # As the recompute command does
+    service.sync_recent_results()
+    assert service.recent_results.get(user_id, 0) is None
@@ -0,0 +1,120 @@
+"""Sharded game session storage tests"""
+import random
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlmodel import Session
+
+from app.core.counters import DEVIATION_SUM, GAMES_PLAYED
+from app.core.shards import ShardSet, create_shard_engine
+from app.models import GameSession, GameStatus
+from app.routers.games.repository import GameRepository, ShardedGameRepository
+from app.scripts import rebalance_shards
+from tests.conftest import TEST_DIR
+
+
+class LocalShardedRepository(ShardedGameRepository):
+    """Sharded repository over shards of its own"""
+
+    def __init__(self, shards: ShardSet):
+        self._shards = shards
+
+    @property
+    def shards(self) -> ShardSet:
+        return self._shards
+
+
+@pytest.fixture(name="repositories", scope="module")
+def fixture_repositories():
+    """The same completed games in 3 shards and in a single file"""
+    shard_dir = Path(TEST_DIR) / "ranked_shards"
+    sharded = LocalShardedRepository(ShardSet(3, str(shard_dir)))
+    single_engine = create_shard_engine(0, str(shard_dir / "single"))
+    rng = random.Random(42)
+    games = []
+    for _ in range(40):
+        user_id = uuid.uuid4()
+        for _ in range(rng.randint(1, 4)):
+            games.append((user_id, rng.randint(0, 5_000), GameStatus.COMPLETED))
+        games.append((user_id, None, GameStatus.STARTED))
+    for user_id, deviation, game_status in games:
+        for engine in (sharded.shards.engine_for(user_id), single_engine):
+            with Session(engine) as session:
+                session.add(
+                    GameSession(
+                        user_id=user_id,
+                        start_time=datetime.utcnow(),
+                        deviation_ms=deviation,
+                        status=game_status,
+                    )
+                )
+                session.commit()
+    return sharded, single_engine
+
+
+@pytest.mark.parametrize("offset, limit", [(0, 10), (7, 5), (35, 10), (0, None)])
+def test_sharded_ranking_matches_a_single_file(repositories, offset, limit):
+    sharded, single_engine = repositories
+    with Session(single_engine) as session:
+        expected_total, expected = GameRepository().get_ranked_players(offset, limit, session)
+
+    total, players = sharded.get_ranked_players(offset, limit, db_session=None)
+
+    assert total == expected_total == 40
+    assert [player[2] for player in players] == pytest.approx(
+        [player[2] for player in expected]
+    )
+    assert {player[0] for player in players} == {player[0] for player in expected}
+
+
+def test_player_rank_matches_the_ranking(repositories):
+    sharded, single_engine = repositories
+    with Session(single_engine) as session:
+        _, players = GameRepository().get_ranked_players(0, None, session)
+        for position, player in list(enumerate(players, 1))[::7]:
+            rank, ranked = GameRepository().get_player_rank(player[0], session)
+            assert (rank, ranked) == (position, player)
+            assert sharded.get_player_rank(player[0], db_session=None) == (rank, ranked)
+        assert GameRepository().get_player_rank(uuid.uuid4(), session) is None
+
+
+def test_each_shard_counts_the_games_it_completes(repositories):
+    sharded, single_engine = repositories
+    with Session(single_engine) as session:
+        expected_games, expected_deviation_sum = GameRepository().get_completed_totals(session)
+    sharded.seed_counters(db_session=None)
+    assert sharded.get_counters(db_session=None) == {
+        GAMES_PLAYED: expected_games,
+        DEVIATION_SUM: expected_deviation_sum,
+    }
+
+    user_id = uuid.uuid4()
+    with Session(sharded.shards.engine_for(user_id), expire_on_commit=False) as session:
+        game = GameSession(user_id=user_id, start_time=datetime.utcnow())
+        session.add(game)
+        session.commit()
+    for _ in range(2):
+        sharded.complete(game.id, datetime.utcnow(), 10_100, 100, db_session=None, user_id=user_id)
+
+    assert sharded.get_counters(db_session=None) == {
+        GAMES_PLAYED: expected_games + 1,
+        DEVIATION_SUM: expected_deviation_sum + 100,
+    }
+
+
+@pytest.mark.parametrize("from_shards, to_shards", [("1", "0"), ("-1", "2")])
+def test_a_rebalance_needs_valid_shard_counts(
+    monkeypatch, tmp_path, capsys, from_shards, to_shards
+):
+    argv = ["rebalance_shards", "--from-shards", from_shards, "--to-shards", to_shards]
+    argv += ["--shard-dir", str(tmp_path)]
+    monkeypatch.setattr("sys.argv", argv)
+
+    with pytest.raises(SystemExit) as exit_info:
+        rebalance_shards.main()
+
+    assert exit_info.value.code == 2
+    assert "shards must be" in capsys.readouterr().err
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,98 @@
+"""Startup tests.
+
+Each measurement runs in a fresh interpreter, since imports are cached.
+Startup time depends on the host, so its budget is only checked when
+STARTUP_BUDGET_SECONDS is set.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import TEST_DIR
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGET_SECONDS = os.environ.get("STARTUP_BUDGET_SECONDS")
+SCHEMA_STATEMENTS = ("CREATE", "ALTER", "PRAGMA")
+PLAYER_COUNT = "count(users.id)"  # Full scan seeding the global counters
+DEFERRED_MODULES = ["jose", "passlib", "uvicorn", "numpy"]
+
+STARTUP_SCRIPT = f"""
+import json, sys, time
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+start = time.perf_counter()
+from app.main import app
+from app.core.database import engine
+imported = time.perf_counter() - start
+loaded = [name for name in {DEFERRED_MODULES!r} if name in sys.modules]
+statements = []
+event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+with TestClient(app) as client:
+    status = client.get("/").status_code
+    ready = time.perf_counter() - start
+print(json.dumps({{
+    "imported": imported, "ready": ready, "status": status, "loaded": loaded,
+    "statements": statements,
+}}))
+"""
+
+
+def measure_startup(database_path: Path) -> dict:
+    """Import the app and serve / in a fresh interpreter, with a fast startup"""
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "STARTUP_MODE": "fast",
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_a_warm_start_skips_schema_creation_and_seeding(tmp_path):
+    database_path = tmp_path / "startup.db"
+    cold = measure_startup(database_path)  # Creates the schema
+
+    warm = measure_startup(database_path)
+
+    def startup_work(timings: dict) -> list:
+        return [
+            statement
+            for statement in timings["statements"]
+            if statement.lstrip().upper().startswith(SCHEMA_STATEMENTS) or PLAYER_COUNT in statement
+        ]
+
+    assert warm["status"] == 200
+    assert any(statement.startswith("CREATE") for statement in startup_work(cold))
+    assert any(PLAYER_COUNT in statement for statement in startup_work(cold))
+    assert startup_work(warm) == []
+
+
+@pytest.mark.skipif(BUDGET_SECONDS is None, reason="Set STARTUP_BUDGET_SECONDS to time startup")
+def test_startup_is_within_budget():
+    database_path = Path(TEST_DIR) / "startup.db"
+    measure_startup(database_path)  # Creates the schema and warms the bytecode cache
+
+    timings = min(
+        (measure_startup(database_path) for _ in range(3)), key=lambda timing: timing["ready"]
+    )
+
+    assert timings["status"] == 200
+    assert timings["ready"] < float(BUDGET_SECONDS), timings["ready"]
+
+
+def test_heavy_libraries_are_imported_on_first_use():
+    timings = measure_startup(Path(TEST_DIR) / "startup.db")
+
+    assert timings["loaded"] == []
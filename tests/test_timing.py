@@ -0,0 +1,121 @@
+"""Game timing tests, driven by an injected monotonic clock"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models import GameSession, GameStatus
+from app.routers.games import service
+from app.routers.games.timing import SessionTimer
+
+SECOND_NS = 1_000_000_000
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand"""
+
+    def __init__(self, now_ns: int = 1_000 * SECOND_NS):
+        self.now_ns = now_ns
+
+    def advance(self, milliseconds: int) -> None:
+        """Move the clock forward"""
+        self.now_ns += milliseconds * 1_000_000
+
+    def __call__(self) -> int:
+        return self.now_ns
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    """Drive the session timer from a fake clock"""
+    clock = FakeClock()
+    monkeypatch.setattr(service.session_timer, "clock", clock)
+    return clock
+
+
+def set_start_time(session_id: str, start_time: datetime) -> None:
+    """Move the persisted start of a game session"""
+    with Session(engine) as db_session:
+        game_session = db_session.get(GameSession, uuid.UUID(session_id))
+        game_session.start_time = start_time
+        db_session.add(game_session)
+        db_session.commit()
+
+
+def get_status(session_id: str) -> GameStatus:
+    """Persisted status of a game session"""
+    with Session(engine) as db_session:
+        return db_session.get(GameSession, uuid.UUID(session_id)).status
+
+
+def test_timer_measures_elapsed_time():
+    clock = FakeClock()
+    timer = SessionTimer(max_age_ns=60 * SECOND_NS, clock=clock)
+    session_id = uuid.uuid4()
+    timer.start(session_id, uuid.uuid4(), datetime.utcnow(), start_ns=clock())
+
+    clock.advance(1_234)
+
+    assert timer.elapsed_ns(timer.get(session_id)) == 1_234_000_000
+
+
+def test_timer_prunes_sessions_too_old_to_stop():
+    clock = FakeClock()
+    timer = SessionTimer(max_age_ns=60 * SECOND_NS, clock=clock)
+    session_id = uuid.uuid4()
+    timer.start(session_id, uuid.uuid4(), datetime.utcnow(), start_ns=clock())
+
+    clock.advance(61_000)
+    timer.prune()
+
+    assert timer.get(session_id) is None
+
+
+def test_stop_scores_from_the_monotonic_clock(client, headers, clock):
+    session_id = client.post("/games/start", headers=headers).json()["session_id"]
+    clock.advance(settings.TARGET_TIME_MS)
+
+    result = client.post(f"/games/{session_id}/stop", headers=headers).json()
+
+    assert result["duration_ms"] == settings.TARGET_TIME_MS
+    assert result["deviation_ms"] == 0
+    assert get_status(session_id) == GameStatus.COMPLETED
+
+
+def test_stop_falls_back_to_the_persisted_start_time(client, headers, clock):
+    session_id = client.post("/games/start", headers=headers).json()["session_id"]
+    service.session_timer.discard(uuid.UUID(session_id))  # As after a restart
+    set_start_time(session_id, datetime.utcnow() - timedelta(seconds=12))
+
+    result = client.post(f"/games/{session_id}/stop", headers=headers).json()
+
+    assert 12_000 <= result["duration_ms"] < 13_000
+    assert get_status(session_id) == GameStatus.COMPLETED
+
+
+def test_stop_expires_a_timed_session(client, headers, clock):
+    session_id = client.post("/games/start", headers=headers).json()["session_id"]
+    clock.advance((settings.GAME_SESSION_EXPIRE_MINUTES * 60 + 1) * 1_000)
+
+    response = client.post(f"/games/{session_id}/stop", headers=headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "This game session has expired"
+    assert get_status(session_id) == GameStatus.EXPIRED
+
+
+def test_stop_expires_a_session_after_a_restart(client, headers, clock):
+    session_id = client.post("/games/start", headers=headers).json()["session_id"]
+    service.session_timer.discard(uuid.UUID(session_id))
+    set_start_time(
+        session_id,
+        datetime.utcnow() - timedelta(minutes=settings.GAME_SESSION_EXPIRE_MINUTES + 1),
+    )
+
+    response = client.post(f"/games/{session_id}/stop", headers=headers)
+
+    assert response.status_code == 400
+    assert get_status(session_id) == GameStatus.EXPIRED